@@ -42,6 +42,7 @@ class afc:
         self.SPOOL = self.printer.load_object(config,'AFC_spool')
         self.ERROR = self.printer.load_object(config,'AFC_error')
         self.FUNCTION = self.printer.load_object(config,'AFC_functions')
+        self.LOOKAHEAD = self.printer.load_object(config,'AFC_lookahead')
         self.IDLE = self.printer.load_object(config,'idle_timeout')
         self.gcode = self.printer.lookup_object('gcode')
 
@@ -50,6 +51,8 @@ class afc:
         self.current        = None
         self.current_loading= None
         self.next_lane_load = None
+        self.staging        = {}    # Completions for lanes being staged in the background, keyed by lane name
+        self.endstops       = {}    # MCU endstops on sensor pins shared by all lanes using the pin, keyed by pin, see AFC_utils.add_endstop
         self.error_state    = False
         self.current_state  = State.INIT
         self.spoolman       = None
@@ -124,7 +127,10 @@ class afc:
         self.short_moves_speed  = config.getfloat("short_moves_speed", 25)          # Speed in mm/s to move filament when doing short moves
         self.short_moves_accel  = config.getfloat("short_moves_accel", 400)         # Acceleration in mm/s squared when doing short moves
         self.short_move_dis     = config.getfloat("short_move_dis", 10)             # Move distance in mm for failsafe moves.
-        self.max_move_dis       = config.getfloat("max_move_dis", 999999)           # Maximum distance to move filament. AFC breaks filament moves over this number into multiple moves. Useful to lower this number if running into timer too close errors when doing long filament moves.
+        self.max_move_dis       = config.getfloat("max_move_dis", 999999)           # Maximum distance of filament to generate steps for at once. AFC queues long moves as one continuous move and generates steps in chunks no longer than this. Useful to lower this number if running into timer too close errors when doing long filament moves.
+        self.approach_margin    = config.getfloat("approach_margin", 10, minval=0)  # Distance in mm before a sensor is expected to trigger where lanes slow down from full speed to a sensor bounded approach. Set to 0 to move the full known distance at full speed
+        self.lookahead_tool_changes = config.getint("lookahead_tool_changes", 3, minval=0) # Number of upcoming tool changes to read ahead for in the file being printed, shown in AFC_lookahead status. Set to 0 to disable
+        self.lookahead_max_bytes = config.getint("lookahead_max_bytes", 65536, minval=4096) # Most bytes of the print file read ahead in one scan, scans continue from where the last one stopped
 
         self.tool_max_unload_attempts = config.getint('tool_max_unload_attempts', 2)# Max number of attempts to unload filament from toolhead when using buffer as ramming sensor
         self.tool_max_load_checks = config.getint('tool_max_load_checks', 4)        # Max number of attempts to check to make sure filament is loaded into toolhead extruder when using buffer as ramming sensor
@@ -138,6 +144,8 @@ class afc:
 
         self.enable_sensors_in_gui = config.getboolean("enable_sensors_in_gui", False) # Set to True to show all sensor switches as filament sensors in mainsail/fluidd gui
         self.load_to_hub        = config.getboolean("load_to_hub", True)            # Fast loads filament to hub when inserted, set to False to disable. This is a global setting and can be overridden at AFC_stepper
+        self.auto_rotation_distance = config.getboolean("auto_rotation_distance", False) # Set to True to have lanes correct their rotation distance from the distance measured between hub and toolhead sensors, compared to other lanes going through the same hub. This is a global setting and can be overridden at AFC_stepper
+        self.spool_inertia_accel = config.getboolean("spool_inertia_accel", False)  # Set to True to scale lane move acceleration with estimated spool inertia, configured accelerations are used for a full 1kg spool and lighter spools move faster. This is a global setting and can be overridden at AFC_stepper
         self._update_trsync(config)
 
         # Get debug and cast to boolean
@@ -187,6 +195,7 @@ class afc:
         self.gcode.register_mux_command('LANE_UNLOAD',  "LANE", lane_obj.name, self.cmd_LANE_UNLOAD,    desc=self.cmd_LANE_UNLOAD_help)
         self.gcode.register_mux_command('HUB_LOAD',     "LANE", lane_obj.name, self.cmd_HUB_LOAD,       desc=self.cmd_HUB_LOAD_help)
         self.gcode.register_mux_command('TOOL_LOAD',    "LANE", lane_obj.name, self.cmd_TOOL_LOAD,      desc=self.cmd_TOOL_LOAD_help)
+        self.gcode.register_mux_command('AFC_STAGE_LANE', "LANE", lane_obj.name, self.cmd_AFC_STAGE_LANE, desc=self.cmd_AFC_STAGE_LANE_help)
 
     def handle_connect(self):
         """
@@ -195,6 +204,7 @@ class afc:
         and assigns it to the instance variable `self.toolhead`.
         """
         self.toolhead = self.printer.lookup_object('toolhead')
+        self.bypass = self.printer.lookup_object('filament_switch_sensor bypass', None)
         moonraker_port = ""
         if self.moonraker_port is not None: moonraker_port = ":{}".format(self.moonraker_port)
 
@@ -207,6 +217,7 @@ class afc:
 
         # GCODE REGISTERS
         self.gcode.register_command('TOOL_UNLOAD',          self.cmd_TOOL_UNLOAD,           desc=self.cmd_TOOL_UNLOAD_help)
+        self.gcode.register_mux_command('LANE_UNLOAD', "LANE", "all", self.cmd_LANE_UNLOAD,   desc=self.cmd_LANE_UNLOAD_help)
         self.gcode.register_command('CHANGE_TOOL',          self.cmd_CHANGE_TOOL,           desc=self.cmd_CHANGE_TOOL_help)
         self.gcode.register_command('AFC_STATUS',           self.cmd_AFC_STATUS,            desc=self.cmd_AFC_STATUS_help)
         self.gcode.register_command('SET_AFC_TOOLCHANGES',  self.cmd_SET_AFC_TOOLCHANGES,   desc=self.cmd_SET_AFC_TOOLCHANGES_help)
@@ -250,11 +261,15 @@ class afc:
                     break
         return float(temp_value), using_min_value
 
-    def _check_extruder_temp(self, CUR_LANE):
-        """
-        Helper function that check to see if extruder needs to be heated, and wait for hotend to get to temp if needed
+    def _set_extruder_temp(self, CUR_LANE):
         """
+        Helper function that sets extruder target temperature for a lane without waiting for it, see
+        `_wait_extruder_temp`. Target is set as early as possible so hotend heats up or cools down while filament is moving.
 
+        :param CUR_LANE: Lane object to set extruder temperature for
+        :return float: Temperature extruder needs to reach before lane filament is moved by the extruder, None if extruder
+                       temperature is not being changed during a print
+        """
         # Prepare extruder and heater.
         # This will need to be done a different way for multiple toolhead extruders
         extruder = self.toolhead.get_extruder()
@@ -263,15 +278,72 @@ class afc:
 
         # If extruder can extruder and printing return and do not update temperature, don't want to modify extruder temperature during prints
         if self.heater.can_extrude and self.FUNCTION.is_printing():
-            return
+            return None
         target_temp, using_min_value = self._get_default_material_temps(CUR_LANE)
 
         # Check to make sure temp is with +/-5 of target temp, not setting if temp is over target temp and using min_extrude_temp value
         if self.heater.target_temp <= (target_temp-5) or (self.heater.target_temp >= (target_temp+5) and not using_min_value):
-            wait = False if self.heater.target_temp >= (target_temp+5) else True
+            self.gcode.respond_info('Setting extruder temperature to {}'.format(target_temp))
+            pheaters.set_temperature(self.heater, target_temp)
+        return target_temp
+
+    def _wait_extruder_temp(self, min_temp):
+        """
+        Helper function that waits for extruder to reach `min_temp`, returns right away if extruder is already hot enough.
+        Extruder cooling down never blocks since filament can be moved while extruder is above temperature. When extruder
+        is heating to its target the wait goes through the heaters module like M109, so temperature has also settled.
+
+        :param min_temp: Temperature to wait for, None to not wait
+        """
+        if min_temp is None:
+            return
+        eventtime = self.reactor.monotonic()
+        current_temp, target_temp = self.heater.get_temp(eventtime)
+        if current_temp >= min_temp:
+            return
+        self.gcode.respond_info('Waiting for extruder to reach temperature {}'.format(min_temp))
+        if target_temp <= min_temp:
+            pheaters = self.printer.lookup_object('heaters')
+            pheaters.set_temperature(self.heater, target_temp, wait=True)
+            return
+        # Target is set hotter for the next lane, only wait until extruder is hot enough for this one
+        while not self.printer.is_shutdown():
+            current_temp, target_temp = self.heater.get_temp(eventtime)
+            # Stop waiting if target was lowered below what is being waited for, extruder will not get there
+            if current_temp >= min_temp or target_temp < min_temp:
+                break
+            self.gcode.respond_raw('T:{:.1f} /{:.1f}'.format(current_temp, target_temp))
+            eventtime = self.reactor.pause(eventtime + 1.)
 
-            self.gcode.respond_info('Setting extruder temperature to {} {}'.format(target_temp, "and waiting for extruder to reach temperature" if wait else ""))
-            pheaters.set_temperature(extruder.get_heater(), target_temp, wait=wait)
+    def _check_extruder_temp(self, CUR_LANE):
+        """
+        Helper function that check to see if extruder needs to be heated, and wait for hotend to get to temp if needed
+        """
+        self._wait_extruder_temp(self._set_extruder_temp(CUR_LANE))
+
+    def _check_unload_temps(self, CUR_LANE, NEXT_LANE):
+        """
+        Helper function that orders extruder temperature changes when CUR_LANE is unloaded before NEXT_LANE is loaded. When
+        NEXT_LANE needs a hotter extruder its target is set at the start of the unload and only CUR_LANE's temperature is
+        waited on. Otherwise CUR_LANE's temperature is used until filament is out of the extruder and NEXT_LANE's target
+        is set after that, so cooling down does not change temperature while filament is still in the extruder. Tips are
+        always formed at CUR_LANE's temperature.
+
+        :param CUR_LANE: Lane object being unloaded
+        :param NEXT_LANE: Lane object that will be loaded after CUR_LANE, can be None
+        :return bool: True if extruder target is already set for NEXT_LANE
+        """
+        extruder = self.toolhead.get_extruder()
+        self.heater = extruder.get_heater()
+        if NEXT_LANE is not None and not self.form_tip and not (self.heater.can_extrude and self.FUNCTION.is_printing()):
+            unload_temp, _ = self._get_default_material_temps(CUR_LANE)
+            load_temp, _ = self._get_default_material_temps(NEXT_LANE)
+            if load_temp > unload_temp:
+                self._set_extruder_temp(NEXT_LANE)
+                self._wait_extruder_temp(unload_temp)
+                return True
+        self._check_extruder_temp(CUR_LANE)
+        return False
 
     def _check_bypass(self, unload=False):
         """
@@ -280,18 +352,14 @@ class afc:
         :param unload: Set True if user is trying to unload, when set to True and filament is loaded AFC runs users renamed stock UNLOAD_FILAMENT macro
         :return        Returns true if filament is present in sensor
         """
-        try:
-            bypass = self.printer.lookup_object('filament_switch_sensor bypass').runout_helper
-            if bypass.filament_present:
-                if unload:
-                    self.gcode.respond_info("Bypass detected, calling manual unload filament routine")
-                    self.gcode.run_script_from_command(self.RENAMED_UNLOAD_FILAMENT)
-                    self.gcode.respond_info("Filament unloaded")
-                else:
-                    self.gcode.respond_info("Filament loaded in bypass, not doing tool load")
-                return True
-        except:
-            pass
+        if self.bypass is not None and self.bypass.runout_helper.filament_present:
+            if unload:
+                self.gcode.respond_info("Bypass detected, calling manual unload filament routine")
+                self.gcode.run_script_from_command(self.RENAMED_UNLOAD_FILAMENT)
+                self.gcode.respond_info("Filament unloaded")
+            else:
+                self.gcode.respond_info("Filament loaded in bypass, not doing tool load")
+            return True
         return False
 
     cmd_SET_AFC_TOOLCHANGES_help = "Sets number of toolchanges for AFC to keep track of"
@@ -435,6 +503,77 @@ class afc:
         with open(self.VarFile+ '.unit', 'w') as f:
             f.write(json.dumps(str, indent=4))
 
+    def _get_abort_message(self, CUR_LANE, message):
+        """
+        Returns failure message for a lane move, replaced with a jam or runout message when the move was stopped
+        because lane jammed or filament ran out or broke during the move
+
+        :param CUR_LANE: Lane that failed to move
+        :param message: Message to use when move was not stopped by a runout
+        """
+        if CUR_LANE.jam_detected:
+            return 'LANE JAMMED, DRIVER LOAD ROSE ABOVE JAM THRESHOLD DURING MOVE\n'
+        sensor = CUR_LANE.get_abort_sensor(CUR_LANE.runout_abort)
+        if sensor is None:
+            return message
+        return 'FILAMENT RAN OUT OR BROKE, {} SENSOR CLEARED DURING MOVE\n'.format(sensor.upper())
+
+    def _ram_load(self, CUR_LANE, CUR_EXTRUDER):
+        """
+        Ram sensor load sequence for extruders using the buffer as toolhead sensor. Lane stays unsynced and
+        moves alongside the extruder for the tool_end and tool_stn moves, then retracts until the buffer advance
+        sensor clears to confirm the load and reset the buffer. Lane is only synced once at the end so step
+        generation is not flushed and TMC current is not changed between the phases.
+
+        :param CUR_LANE: Lane being loaded
+        :param CUR_EXTRUDER: Extruder lane is being loaded into
+        :return bool: False if filament did not reach tool_end sensor
+        """
+        if CUR_EXTRUDER.tool_end:
+            tool_attempts = 0
+            while not CUR_EXTRUDER.tool_end_state:
+                tool_attempts += 1
+                CUR_LANE.move_with_extruder(CUR_LANE.short_move_dis, CUR_EXTRUDER.tool_load_speed)
+                if tool_attempts > 20:
+                    message = ('FAILED TO LOAD TO TOOL END, CHECK FILAMENT PATH\n||=====||====||==>--||\nTRG   LOAD   HUB   TOOL')
+                    self.ERROR.handle_lane_failure(CUR_LANE, message)
+                    return False
+
+        # Adjust tool position for loading.
+        CUR_LANE.move_with_extruder(CUR_EXTRUDER.tool_stn, CUR_EXTRUDER.tool_load_speed)
+
+        # Lane retracts until buffer advance sensor clears, stopped by the sensor once it clears
+        max_dis = CUR_LANE.short_move_dis * (self.tool_max_load_checks + 1)
+        cleared, _ = CUR_LANE.move_to_trigger('tool_start', max_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel,
+                                              triggered=False)
+        if not cleared:
+            msg = ''
+            msg += "Buffer did not become compressed after {} short moves.\n".format(self.tool_max_load_checks)
+            msg += "Tool may not be loaded"
+            self.gcode.respond_info("<span class=warning--text>{}</span>".format(msg))
+        CUR_LANE.sync_to_extruder()
+        return True
+
+    def _ram_unload(self, CUR_LANE, CUR_EXTRUDER):
+        """
+        Ram sensor unload sequence for extruders using the buffer as toolhead sensor. Lane is unsynced once and
+        retracts until the buffer trailing sensor triggers, then moves alongside the extruder for the tool_stn_unload
+        move. Lane stays unsynced afterwards.
+
+        :param CUR_LANE: Lane being unloaded
+        :param CUR_EXTRUDER: Extruder lane is being unloaded from
+        """
+        # if ramming is enabled, AFC will retract to collapse buffer before unloading
+        CUR_LANE.unsync_to_extruder()
+        max_dis = CUR_LANE.short_move_dis * (self.tool_max_unload_attempts + 1)
+        compressed, _ = CUR_LANE.move_to_trigger('buffer_trailing', max_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel)
+        if not compressed:
+            msg = ''
+            msg += "Buffer did not become compressed after {} short moves.\n".format(self.tool_max_unload_attempts)
+            msg += "Increasing 'tool_max_unload_attempts' may improve loading reliablity"
+            self.gcode.respond_info("<span class=warning--text>{}</span>".format(msg))
+        CUR_LANE.move_with_extruder(CUR_EXTRUDER.tool_stn_unload * -1, CUR_EXTRUDER.tool_unload_speed)
+
     # HUB COMMANDS
     cmd_HUB_LOAD_help = "Load lane into hub"
     def cmd_HUB_LOAD(self, gcmd):
@@ -460,47 +599,153 @@ class afc:
         CUR_LANE = self.lanes[lane]
         CUR_HUB = CUR_LANE.hub_obj
         if CUR_LANE.prep_state == False: return
+        self._wait_staging(CUR_LANE)
         CUR_LANE.status = 'HUB Loading'
-        if CUR_LANE.load_state == False:
-            CUR_LANE.do_enable(True)
-            while CUR_LANE.load_state == False:
-                CUR_LANE.move( CUR_HUB.move_dis, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel)
+        CUR_LANE.do_enable(True)
+        triggered, _ = CUR_LANE.move_to_trigger('load', CUR_HUB.move_dis * 20, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel)
+        if not triggered:
+            message = ('FAILED TO LOAD, CHECK FILAMENT AT TRIGGER\n||==>--||----||------||\nTRG   LOAD   HUB    TOOL')
+            self.ERROR.handle_lane_failure(CUR_LANE, message, pause=False)
+            return
+        # Move to the hub without stopping before looking for the hub sensor
+        hub_approach = []
+        hub_path = None
         if CUR_LANE.loaded_to_hub == False:
-            CUR_LANE.move(CUR_LANE.dist_hub, CUR_LANE.dist_hub_move_speed, CUR_LANE.dist_hub_move_accel, True if CUR_LANE.dist_hub > 200 else False)
-        while CUR_HUB.state == False:
-            CUR_LANE.move(CUR_HUB.move_dis, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel)
-        while CUR_HUB.state == True:
-            CUR_LANE.move(CUR_HUB.move_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel)
+            hub_path = 'hub'
+            hub_approach.append((CUR_LANE.get_path_length(hub_path, CUR_LANE.dist_hub), CUR_LANE.dist_hub_move_speed, CUR_LANE.dist_hub_move_accel))
+        hub_dis = CUR_LANE.get_trigger_bound(CUR_HUB.move_dis + CUR_LANE.short_move_dis * 20, hub_path)
+        triggered, _ = CUR_LANE.move_to_trigger('hub', hub_dis, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel,
+                                                assist_active=CUR_LANE.dist_hub > 200, approach_moves=CUR_LANE.get_approach_moves(hub_approach, hub_path),
+                                                path=hub_path, abort_on=CUR_LANE.runout_abort)
+        if not triggered:
+            message = self._get_abort_message(CUR_LANE, 'PAST HUB, CHECK FILAMENT PATH\n||=====||==>--||-----||\nTRG   LOAD   HUB   TOOL')
+            self.ERROR.handle_lane_failure(CUR_LANE, message, pause=False)
+            return
+        triggered, _ = CUR_LANE.move_to_trigger('hub', CUR_HUB.move_dis * -20, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel, triggered=False)
+        if not triggered:
+            message = 'HUB NOT CLEARING\n'
+            self.ERROR.handle_lane_failure(CUR_LANE, message, pause=False)
+            return
         CUR_LANE.status = None
         CUR_LANE.do_enable(False)
         CUR_LANE.loaded_to_hub = True
         self.save_vars()
 
+    cmd_AFC_STAGE_LANE_help = "Move lane to just before hub in the background"
+    def cmd_AFC_STAGE_LANE(self, gcmd):
+        """
+        This function moves a lane from its load sensor to just before the hub in the background so the next
+        tool load of the lane starts at the hub. The print keeps running while the lane moves, which takes the
+        load sensor to hub move out of the next tool change. Lane status shows staged once it is done.
+
+        Usage: `AFC_STAGE_LANE LANE=<lane>`
+        Example: `AFC_STAGE_LANE LANE=leg2`
+
+        Args:
+            gcmd: The G-code command object containing the parameters for the command.
+                  Expected parameter:
+                  - LANE: The name of the lane to be staged.
+
+        Returns:
+            None
+        """
+        lane = gcmd.get('LANE', None)
+        if lane not in self.lanes:
+            self.gcode.respond_info('{} Unknown'.format(lane))
+            return
+        if not self.STAGE_LANE(self.lanes[lane]):
+            self.gcode.respond_info("LANE {} can't be staged".format(lane))
+
+    def STAGE_LANE(self, CUR_LANE):
+        """
+        Starts staging a lane in a reactor callback, lanes are only staged when they have filament at the load
+        sensor, are not already at the hub and are not loaded in the toolhead.
+
+        Args:
+            CUR_LANE: The lane object to be staged.
+
+        Returns:
+            bool: True if staging was started.
+        """
+        if (CUR_LANE.name == self.current or CUR_LANE.hub == 'direct' or CUR_LANE.name in self.staging
+                or CUR_LANE.loaded_to_hub or not CUR_LANE._afc_prep_done or CUR_LANE.status not in (None, 'Loaded')
+                or not (CUR_LANE.prep_state and CUR_LANE.load_state)):
+            return False
+
+        completion = self.reactor.completion()
+        self.staging[CUR_LANE.name] = completion
+
+        def run_stage(eventtime):
+            try:
+                if CUR_LANE.stage_to_hub():
+                    CUR_LANE.loaded_to_hub = True
+                    self.save_vars()
+                else:
+                    self.gcode.respond_info("LANE {} filament ran out while staging".format(CUR_LANE.name))
+            finally:
+                del self.staging[CUR_LANE.name]
+                completion.complete(True)
+        self.reactor.register_callback(run_stage)
+        return True
+
+    def _wait_staging(self, CUR_LANE):
+        """
+        Waits for a lane that is being staged to finish before lane is moved again, and clears its staged state
+        """
+        completion = self.staging.get(CUR_LANE.name)
+        if completion is not None:
+            completion.wait()
+        CUR_LANE.staged = False
+
     cmd_LANE_UNLOAD_help = "Unload lane from extruder"
     def cmd_LANE_UNLOAD(self, gcmd):
         """
         This function handles the unloading of a specified lane from the extruder. It performs
         several checks and movements to ensure the lane is properly unloaded.
 
+        Setting LANE to all ejects every lane that has filament and is not loaded in the toolhead, lanes are
+        ejected at the same time up to the number of lanes each unit can move at once.
+
         Usage: `LANE_UNLOAD LANE=<lane>`
         Example: `LANE_UNLOAD LANE=leg1`
 
         Args:
             gcmd: The G-code command object containing the parameters for the command.
                   Expected parameter:
-                  - LANE: The name of the lane to be unloaded.
+                  - LANE: The name of the lane to be unloaded, or all to unload all lanes.
 
         Returns:
             None
         """
         lane = gcmd.get('LANE', None)
+        if lane == 'all':
+            eject_lanes = [CUR_LANE for CUR_LANE in self.lanes.values()
+                           if CUR_LANE.name != self.current and CUR_LANE.hub != 'direct' and (CUR_LANE.prep_state or CUR_LANE.load_state)]
+            self.current_state = State.EJECTING_LANE
+            self.FUNCTION.run_lane_jobs(eject_lanes, self.LANE_UNLOAD)
+            self.current_state = State.IDLE
+            return
+
         if lane not in self.lanes:
             self.gcode.respond_info('{} Unknown'.format(lane))
             return
-        CUR_LANE = self.lanes[lane]
-        CUR_HUB = CUR_LANE.hub_obj
 
         self.current_state = State.EJECTING_LANE
+        self.LANE_UNLOAD(self.lanes[lane])
+        self.current_state = State.IDLE
+
+    def LANE_UNLOAD(self, CUR_LANE):
+        """
+        This function ejects a lane that is not loaded in the toolhead back past its load sensor.
+
+        Args:
+            CUR_LANE: The lane object to be unloaded.
+
+        Returns:
+            bool: True if lane was ejected, False if lane could not be ejected.
+        """
+        CUR_HUB = CUR_LANE.hub_obj
+        self._wait_staging(CUR_LANE)
 
         if CUR_LANE.name != self.current and CUR_LANE.hub != 'direct':
             # Setting status as ejecting so if filament is removed and de-activates the prep sensor while
@@ -509,11 +754,19 @@ class afc:
             CUR_LANE.status = 'ejecting'
             self.save_vars()
             CUR_LANE.do_enable(True)
+            if CUR_LANE.espooler_eject and CUR_LANE.espooler_rewind('load'):
+                CUR_LANE.loaded_to_hub = False
+            # Retract from the hub without stopping before looking for the load sensor to clear
+            load_approach = []
             if CUR_LANE.loaded_to_hub:
-                CUR_LANE.move(CUR_LANE.dist_hub * -1, CUR_LANE.dist_hub_move_speed, CUR_LANE.dist_hub_move_accel, True if CUR_LANE.dist_hub > 200 else False)
+                load_approach.append((CUR_LANE.dist_hub * -1, CUR_LANE.dist_hub_move_speed, CUR_LANE.dist_hub_move_accel))
             CUR_LANE.loaded_to_hub = False
-            while CUR_LANE.load_state == True:
-               CUR_LANE.move( CUR_HUB.move_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel, True)
+            triggered, _ = CUR_LANE.move_to_trigger('load', CUR_HUB.move_dis * -20, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel,
+                                                    triggered=False, assist_active=True, approach_moves=load_approach)
+            if not triggered:
+                message = 'LOAD SENSOR NOT CLEARING\n'
+                self.ERROR.handle_lane_failure(CUR_LANE, message, pause=False)
+                return False
             CUR_LANE.move( CUR_HUB.move_dis * -5, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel)
             CUR_LANE.do_enable(False)
             CUR_LANE.status = None
@@ -522,14 +775,14 @@ class afc:
             # Removing spool from vars since it was ejected
             self.SPOOL.set_spoolID( CUR_LANE, "")
             self.gcode.respond_info("LANE {} eject done".format(CUR_LANE.name))
+            return True
 
         elif CUR_LANE.name == self.current:
             self.gcode.respond_info("LANE {} is loaded in toolhead, can't unload.".format(CUR_LANE.name))
 
         elif CUR_LANE.hub == 'direct':
             self.gcode.respond_info("LANE {} is a direct lane must be tool unloaded.".format(CUR_LANE.name))
-
-        self.current_state = State.IDLE
+        return False
 
     cmd_TOOL_LOAD_help = "Load lane into tool"
     def cmd_TOOL_LOAD(self, gcmd):
@@ -589,6 +842,8 @@ class afc:
 
         # Lookup extruder and hub objects associated with the lane.
         CUR_HUB = CUR_LANE.hub_obj
+        # A staged lane is already just before the hub and loads like a lane loaded to hub.
+        self._wait_staging(CUR_LANE)
 
         CUR_EXTRUDER = CUR_LANE.extruder_obj
         self.current_state = State.LOADING
@@ -602,85 +857,87 @@ class afc:
         # Check if the lane is in a state ready to load and hub is clear.
         if (CUR_LANE.load_state and not CUR_HUB.state) or CUR_LANE.hub == 'direct':
 
-            self._check_extruder_temp(CUR_LANE)
+            # Extruder heats while filament moves to the toolhead, it is only waited on before the extruder moves filament
+            load_temp = self._set_extruder_temp(CUR_LANE)
 
             # Enable the lane for filament movement.
             CUR_LANE.do_enable(True)
 
-            # Move filament to the hub if it's not already loaded there.
+            # Move filament to the hub if it's not already loaded there. Moves leading up to a sensor are joined with
+            # the sensor move, lane cruises at full speed until approach_margin before the sensor is expected to
+            # trigger and only the last part of the move is slowed down and bounded by the sensor. Distances learned
+            # from earlier loads are used in place of config values once enough of them have been recorded.
+            approach = []
+            path = None
             if not CUR_LANE.loaded_to_hub or CUR_LANE.hub == 'direct':
-                CUR_LANE.move(CUR_LANE.dist_hub, CUR_LANE.dist_hub_move_speed, CUR_LANE.dist_hub_move_accel, CUR_LANE.dist_hub > 200)
+                if CUR_LANE.hub != 'direct': path = 'hub'
+                approach.append((CUR_LANE.get_path_length(path, CUR_LANE.dist_hub), CUR_LANE.dist_hub_move_speed, CUR_LANE.dist_hub_move_accel))
 
             CUR_LANE.loaded_to_hub = True
-            hub_attempts = 0
 
             # Ensure filament moves past the hub.
-            while not CUR_HUB.state and CUR_LANE.hub != 'direct':
-                if hub_attempts == 0:
-                    CUR_LANE.move(CUR_HUB.move_dis, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel)
-                else:
-                    CUR_LANE.move(CUR_LANE.short_move_dis, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel)
-                hub_attempts += 1
-                if hub_attempts > 20:
-                    message = ('PAST HUB, CHECK FILAMENT PATH\n||=====||==>--||-----||\nTRG   LOAD   HUB   TOOL')
+            if CUR_LANE.hub != 'direct':
+                hub_dis = CUR_LANE.get_trigger_bound(CUR_HUB.move_dis + CUR_LANE.short_move_dis * 20, path)
+                triggered, _ = CUR_LANE.move_to_trigger('hub', hub_dis, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel,
+                                                        assist_active=CUR_LANE.dist_hub > 200, approach_moves=CUR_LANE.get_approach_moves(approach, path),
+                                                        path=path, abort_on=CUR_LANE.runout_abort)
+                if not triggered:
+                    message = self._get_abort_message(CUR_LANE, 'PAST HUB, CHECK FILAMENT PATH\n||=====||==>--||-----||\nTRG   LOAD   HUB   TOOL')
                     self.ERROR.handle_lane_failure(CUR_LANE, message)
                     return False
 
-            # Move filament towards the toolhead.
-            if CUR_LANE.hub != 'direct':
-                CUR_LANE.move(CUR_HUB.afc_bowden_length, CUR_LANE.long_moves_speed, CUR_LANE.long_moves_accel, True)
+                # Move filament towards the toolhead.
+                path = 'bowden'
+                approach = [(CUR_LANE.get_path_length(path, CUR_HUB.afc_bowden_length), CUR_LANE.long_moves_speed, CUR_LANE.long_moves_accel)]
 
             # Ensure filament reaches the toolhead.
-            tool_attempts = 0
             if CUR_EXTRUDER.tool_start:
-                while not CUR_LANE.get_toolhead_sensor_state():
-                    tool_attempts += 1
-                    CUR_LANE.move(CUR_LANE.short_move_dis, CUR_EXTRUDER.tool_load_speed, CUR_LANE.long_moves_accel)
-                    if tool_attempts > 20:
-                        message = ('FAILED TO LOAD TO TOOL, CHECK FILAMENT PATH\n||=====||====||==>--||\nTRG   LOAD   HUB   TOOL')
-                        self.ERROR.handle_lane_failure(CUR_LANE, message)
+                tool_dis = CUR_LANE.get_trigger_bound(CUR_LANE.short_move_dis * 20, path)
+                triggered, _ = CUR_LANE.move_to_trigger('tool_start', tool_dis, CUR_EXTRUDER.tool_load_speed, CUR_LANE.long_moves_accel,
+                                                        assist_active=CUR_LANE.hub != 'direct' or CUR_LANE.dist_hub > 200,
+                                                        approach_moves=CUR_LANE.get_approach_moves(approach, path), path=path,
+                                                        abort_on=CUR_LANE.runout_abort)
+                if not triggered:
+                    message = self._get_abort_message(CUR_LANE, 'FAILED TO LOAD TO TOOL, CHECK FILAMENT PATH\n||=====||====||==>--||\nTRG   LOAD   HUB   TOOL')
+                    self.ERROR.handle_lane_failure(CUR_LANE, message)
+                    return False
+            else:
+                for distance, speed, accel in approach:
+                    completed, _ = CUR_LANE.move_with_abort(distance, speed, accel, CUR_LANE.hub != 'direct' or CUR_LANE.dist_hub > 200)
+                    if not completed:
+                        self.ERROR.handle_lane_failure(CUR_LANE, self._get_abort_message(CUR_LANE, ''))
                         return False
 
             # Synchronize lane's extruder stepper and finalize tool loading.
             CUR_LANE.status = 'Tool Loaded'
             self.save_vars()
-            CUR_LANE.sync_to_extruder()
 
-            if CUR_EXTRUDER.tool_end:
-                pos = self.toolhead.get_position()
-                while not CUR_EXTRUDER.tool_end_state:
-                    tool_attempts += 1
-                    pos[3] += CUR_LANE.short_move_dis
-                    self.toolhead.manual_move(pos, CUR_EXTRUDER.tool_load_speed)
-                    self.toolhead.wait_moves()
-                    if tool_attempts > 20:
-                        message = ('FAILED TO LOAD TO TOOL END, CHECK FILAMENT PATH\n||=====||====||==>--||\nTRG   LOAD   HUB   TOOL')
-                        self.ERROR.handle_lane_failure(CUR_LANE, message)
-                        return False
-
-            # Adjust tool position for loading.
-            pos = self.toolhead.get_position()
-            pos[3] += CUR_EXTRUDER.tool_stn
-            self.toolhead.manual_move(pos, CUR_EXTRUDER.tool_load_speed)
-            self.toolhead.wait_moves()
+            self._wait_extruder_temp(load_temp)
 
             # Check if ramming is enabled, if it is go through ram load sequence.
-            # Lane will load until Advance sensor is True
-            # After the tool_stn distance the lane will retract off the sensor to confirm load and reset buffer
             if CUR_EXTRUDER.tool_start == "buffer":
-                CUR_LANE.unsync_to_extruder()
-                load_checks = 0
-                while CUR_LANE.get_toolhead_sensor_state() == True:
-                    CUR_LANE.move( CUR_LANE.short_move_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel )
-                    load_checks += 1
-                    self.reactor.pause(self.reactor.monotonic() + 0.1)
-                    if load_checks > self.tool_max_load_checks:
-                        msg = ''
-                        msg += "Buffer did not become compressed after {} short moves.\n".format(self.tool_max_load_checks)
-                        msg += "Tool may not be loaded"
-                        self.gcode.respond_info("<span class=warning--text>{}</span>".format(msg))
-                        break
+                if not self._ram_load(CUR_LANE, CUR_EXTRUDER):
+                    return False
+            else:
                 CUR_LANE.sync_to_extruder()
+
+                if CUR_EXTRUDER.tool_end:
+                    tool_attempts = 0
+                    pos = self.toolhead.get_position()
+                    while not CUR_EXTRUDER.tool_end_state:
+                        tool_attempts += 1
+                        pos[3] += CUR_LANE.short_move_dis
+                        self.toolhead.manual_move(pos, CUR_EXTRUDER.tool_load_speed)
+                        self.toolhead.wait_moves()
+                        if tool_attempts > 20:
+                            message = ('FAILED TO LOAD TO TOOL END, CHECK FILAMENT PATH\n||=====||====||==>--||\nTRG   LOAD   HUB   TOOL')
+                            self.ERROR.handle_lane_failure(CUR_LANE, message)
+                            return False
+
+                # Adjust tool position for loading.
+                pos = self.toolhead.get_position()
+                pos[3] += CUR_EXTRUDER.tool_stn
+                self.toolhead.manual_move(pos, CUR_EXTRUDER.tool_load_speed)
             # Update tool and lane status.
             CUR_LANE.set_loaded()
             CUR_LANE.enable_buffer()
@@ -747,7 +1004,7 @@ class afc:
         # User manually unloaded spool from toolhead, remove spool from active status
         self.SPOOL.set_active_spool( None )
 
-    def TOOL_UNLOAD(self, CUR_LANE):
+    def TOOL_UNLOAD(self, CUR_LANE, NEXT_LANE=None):
         """
         This function handles the unloading of a specified lane from the tool. It performs
         several checks and movements to ensure the lane is properly unloaded.
@@ -756,6 +1013,7 @@ class afc:
         Example: `TOOL_UNLOAD LANE=leg1`
         Args:
             CUR_LANE: The lane object to be unloaded from the tool.
+            NEXT_LANE: The lane object that will be loaded next, extruder temperature is changed for it during the unload.
 
         Returns:
             bool: True if unloading was successful, False if an error occurred.
@@ -781,18 +1039,16 @@ class afc:
         CUR_EXTRUDER = CUR_LANE.extruder_obj
 
         # Prepare the extruder and heater for unloading.
-        self._check_extruder_temp( CUR_LANE )
+        next_temp_set = self._check_unload_temps(CUR_LANE, NEXT_LANE)
 
-        # Quick pull to prevent oozing.
+        # Quick pull to prevent oozing. Toolhead moves are queued together and only waited on before a sensor is read.
         pos = self.toolhead.get_position()
         pos[3] -= 2
         self.toolhead.manual_move(pos, CUR_EXTRUDER.tool_unload_speed)
-        self.toolhead.wait_moves()
 
         # Perform Z-hop to avoid collisions during unloading.
         pos[2] += self.z_hop
         self.toolhead.manual_move(pos, CUR_EXTRUDER.tool_unload_speed)
-        self.toolhead.wait_moves()
 
         # Disable the buffer if it's active.
         CUR_LANE.disable_buffer()
@@ -800,9 +1056,8 @@ class afc:
         # Activate LED indicator for unloading.
         self.FUNCTION.afc_led(CUR_LANE.led_unloading, CUR_LANE.led_index)
 
-        if CUR_LANE.extruder_stepper.motion_queue != CUR_LANE.extruder_name:
-            # Synchronize the extruder stepper with the lane.
-            CUR_LANE.sync_to_extruder()
+        # Synchronize the extruder stepper with the lane.
+        CUR_LANE.sync_to_extruder()
 
         # Enable the lane for unloading operations.
         CUR_LANE.do_enable(True)
@@ -823,27 +1078,12 @@ class afc:
             else:
                 self.gcode.run_script_from_command(self.form_tip_cmd)
 
-        # Attempt to unload the filament from the extruder, retrying if needed.
+        # Attempt to unload the filament from the extruder, retrying if needed. Queued moves need to finish before
+        # toolhead or buffer sensors are read.
+        self.toolhead.wait_moves()
         num_tries = 0
         if CUR_EXTRUDER.tool_start == "buffer":
-            # if ramming is enabled, AFC will retract to collapse buffer before unloading
-            CUR_LANE.unsync_to_extruder()
-            while CUR_LANE.get_trailing() == False:
-                # attempt to return buffer to trailng pin
-                CUR_LANE.move( CUR_LANE.short_move_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel )
-                num_tries += 1
-                self.reactor.pause(self.reactor.monotonic() + 0.1)
-                if num_tries > self.tool_max_unload_attempts:
-                    msg = ''
-                    msg += "Buffer did not become compressed after {} short moves.\n".format(self.tool_max_unload_attempts)
-                    msg += "Increasing 'tool_max_unload_attempts' may improve loading reliablity"
-                    self.gcode.respond_info("<span class=warning--text>{}</span>".format(msg))
-                    break
-            CUR_LANE.sync_to_extruder(False)
-            pos = self.toolhead.get_position()
-            pos[3] -= CUR_EXTRUDER.tool_stn_unload
-            self.toolhead.manual_move(pos, CUR_EXTRUDER.tool_unload_speed)
-            self.toolhead.wait_moves()
+            self._ram_unload(CUR_LANE, CUR_EXTRUDER)
         else:
             while CUR_LANE.get_toolhead_sensor_state():
                 num_tries += 1
@@ -860,54 +1100,66 @@ class afc:
 
         # Move filament past the sensor after the extruder, if applicable.
         if CUR_EXTRUDER.tool_sensor_after_extruder > 0:
-            pos = self.toolhead.get_position()
-            pos[3] -= CUR_EXTRUDER.tool_sensor_after_extruder
-            self.toolhead.manual_move(pos, CUR_EXTRUDER.tool_unload_speed)
-            self.toolhead.wait_moves()
+            if CUR_EXTRUDER.tool_start == "buffer":
+                # Lane is no longer synced after ram unload
+                CUR_LANE.move_with_extruder(CUR_EXTRUDER.tool_sensor_after_extruder * -1, CUR_EXTRUDER.tool_unload_speed)
+            else:
+                pos = self.toolhead.get_position()
+                pos[3] -= CUR_EXTRUDER.tool_sensor_after_extruder
+                self.toolhead.manual_move(pos, CUR_EXTRUDER.tool_unload_speed)
         self.save_vars()
         # Synchronize and move filament out of the hub.
         CUR_LANE.unsync_to_extruder()
-        if CUR_LANE.hub !='direct':
-            CUR_LANE.move(CUR_HUB.afc_bowden_length * -1, CUR_LANE.long_moves_speed, CUR_LANE.long_moves_accel, True)
-        else:
-            CUR_LANE.move(CUR_LANE.dist_hub * -1, CUR_LANE.dist_hub_move_speed, CUR_LANE.dist_hub_move_accel, CUR_LANE.dist_hub > 200)
+
+        # Filament is out of the extruder, change temperature for next lane while filament moves
+        if NEXT_LANE is not None and not next_temp_set:
+            self._set_extruder_temp(NEXT_LANE)
 
         # Clear toolhead's loaded state for easier error handling later.
         CUR_LANE.set_unloaded()
 
         self.save_vars()
 
-        # Ensure filament is fully cleared from the hub.
-        num_tries = 0
-        while CUR_HUB.state:
-            CUR_LANE.move(CUR_LANE.short_move_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel, True)
-            num_tries += 1
-            if num_tries > (CUR_HUB.afc_bowden_length / CUR_LANE.short_move_dis):
+        # Ensure filament is fully cleared from the hub. Bowden retract is joined with the hub move so lane only
+        # slows down approach_margin before the hub is expected to clear.
+        if CUR_LANE.hub != 'direct':
+            bowden_dis = CUR_LANE.get_path_length('hub_clear', CUR_HUB.afc_bowden_length)
+            bowden_retract = CUR_LANE.get_approach_moves([(bowden_dis * -1, CUR_LANE.long_moves_speed, CUR_LANE.long_moves_accel)], 'hub_clear')
+            hub_dis = CUR_LANE.get_trigger_bound(CUR_HUB.afc_bowden_length, 'hub_clear')
+            triggered, _ = CUR_LANE.move_to_trigger('hub', hub_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel,
+                                                    triggered=False, assist_active=True, approach_moves=bowden_retract, path='hub_clear')
+            if not triggered:
                 # Handle failure if the filament doesn't clear the hub.
                 message = 'HUB NOT CLEARING\n'
                 self.ERROR.handle_lane_failure(CUR_LANE, message)
                 return False
 
-        #Move to make sure hub path is clear based on the move_clear_dis var
+        #Move to make sure hub path is clear based on the move_clear_dis var. Move runs on the lanes own timeline
+        # so a lane on another hub can start loading while this lane finishes retracting, lane is disabled once the
+        # move is done unless filament is cut at the hub next.
+        park_move = None
         if CUR_LANE.hub !='direct':
-            CUR_LANE.move( CUR_HUB.hub_clear_move_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel, True)
+            park_move = CUR_LANE.schedule_move( CUR_HUB.hub_clear_move_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel, True,
+                                                disable=not CUR_HUB.cut)
 
         # Cut filament at the hub, if configured.
             if CUR_HUB.cut:
+                park_move.wait()
+                park_move = None
                 if CUR_HUB.cut_cmd == 'AFC':
-                    CUR_HUB.hub_cut(CUR_LANE)
+                    if not CUR_HUB.hub_cut(CUR_LANE):
+                        message = 'HUB CUT FAILED, HUB SENSOR DID NOT REACH CUT POSITION\n'
+                        self.ERROR.handle_lane_failure(CUR_LANE, message)
+                        return False
                 else:
                     self.gcode.run_script_from_command(CUR_HUB.cut_cmd)
 
                 # Confirm the hub is clear after the cut.
-                while CUR_HUB.state:
-                    CUR_LANE.move(CUR_LANE.short_move_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel, True)
-                    num_tries += 1
-                    # TODO: Figure out max number of tries
-                    if num_tries > (CUR_HUB.afc_bowden_length / CUR_LANE.short_move_dis):
-                        message = 'HUB NOT CLEARING after hub cut\n'
-                        self.ERROR.handle_lane_failure(CUR_LANE, message)
-                        return False
+                triggered, _ = CUR_LANE.move_to_trigger('hub', CUR_HUB.afc_bowden_length * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel, triggered=False, assist_active=True)
+                if not triggered:
+                    message = 'HUB NOT CLEARING after hub cut\n'
+                    self.ERROR.handle_lane_failure(CUR_LANE, message)
+                    return False
 
         # Finalize unloading and reset lane state.
         CUR_LANE.loaded_to_hub = True
@@ -915,10 +1167,17 @@ class afc:
         CUR_LANE.status = None
 
         if CUR_LANE.hub =='direct':
-            while CUR_LANE.prep_state:
-                CUR_LANE.move( CUR_LANE.short_move_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel, True)
+            prep_dis = CUR_LANE.dist_hub + CUR_LANE.short_move_dis * 20 + self.approach_margin
+            dist_hub_retract = CUR_LANE.get_approach_moves([(CUR_LANE.dist_hub * -1, CUR_LANE.dist_hub_move_speed, CUR_LANE.dist_hub_move_accel)])
+            triggered, _ = CUR_LANE.move_to_trigger('prep', prep_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel,
+                                                    triggered=False, assist_active=True, approach_moves=dist_hub_retract)
+            if not triggered:
+                message = 'PREP NOT CLEARING\n'
+                self.ERROR.handle_lane_failure(CUR_LANE, message)
+                return False
 
-        CUR_LANE.do_enable(False)
+        if park_move is None:
+            CUR_LANE.do_enable(False)
         self.save_vars()
         self.gcode.respond_info("LANE {} unload done".format(CUR_LANE.name))
         self.current_state = State.IDLE
@@ -994,11 +1253,19 @@ class afc:
                     if c_lane not in self.lanes:
                         self.gcode.respond_info('{} Unknown'.format(c_lane))
                         return
-                    if not self.TOOL_UNLOAD(self.lanes[c_lane]):
+                    old_lane = self.lanes[c_lane]
+                    # Lanes on different hubs only share the path after their hubs, so new lane can move up to its
+                    # hub while the old lane unloads.
+                    if old_lane.hub_obj is not CUR_LANE.hub_obj:
+                        self.STAGE_LANE(CUR_LANE)
+                    if not self.TOOL_UNLOAD(old_lane, CUR_LANE):
                         # Abort if the unloading process fails.
                         msg = (' UNLOAD ERROR NOT CLEARED')
-                        self.ERROR.fix(msg, self.lanes[c_lane])  #send to error handling
+                        self.ERROR.fix(msg, old_lane)  #send to error handling
                         return
+                    # Lanes on the same hub share the hub, wait for the old lane to finish retracting out of it
+                    if old_lane.hub_obj is CUR_LANE.hub_obj:
+                        old_lane.wait_lane_moves()
             # Load the new lane and restore the toolhead position if successful.
             if self.TOOL_LOAD(CUR_LANE) and not self.error_state:
                 self.gcode.respond_info("{} is now loaded in toolhead".format(CUR_LANE.name))
@@ -1006,6 +1273,8 @@ class afc:
                 self.in_toolchange = False
                 # Setting next lane load as none since toolchange was successful
                 self.next_lane_load = None
+                # Move lookahead past this tool change
+                self.LOOKAHEAD.update()
         else:
             self.gcode.respond_info("{} already loaded".format(CUR_LANE.name))
             if not self.error_state and self.number_of_toolchanges != 0 and self.current_toolchange != self.number_of_toolchanges:
@@ -14,6 +14,8 @@ class afcBoxTurtle(afcUnit):
     def __init__(self, config):
         super().__init__(config)
         self.type = config.get('type', 'Box_Turtle')
+        # All four lane drivers can be powered at once
+        self.max_concurrent_lanes = config.getint("max_concurrent_lanes", 4, minval=1)
 
     def handle_connect(self):
         """
@@ -113,8 +113,7 @@ class AFCtrigger:
             if self.printer.state_message == 'Printer is ready' and self.enable:
                 if self.AFC.current is not None:
                     CUR_LANE = self.AFC.lanes[self.AFC.current]
-                    CUR_EXTRUDER = self.printer.lookup_object('AFC_extruder ' + CUR_LANE.extruder_name)
-                    if CUR_EXTRUDER.tool_start_state:
+                    if CUR_LANE.extruder_obj.tool_start_state:
                         self.belay_move_lane(state)
         self.last_state = state
 
@@ -159,7 +158,7 @@ class AFCtrigger:
         if self.AFC.current is None: return
 
         cur_stepper = self.AFC.lanes[self.AFC.current]
-        cur_stepper.update_rotation_distance( multiplier )
+        cur_stepper.schedule_rotation_distance( multiplier )
         if multiplier > 1:
             self.last_state = TRAILING_STATE_NAME
             if self.led:
@@ -169,8 +168,7 @@ class AFCtrigger:
             if self.led:
                 self.AFC.FUNCTION.afc_led(self.led_advancing, self.led_index)
         if self.debug:
-            stepper = cur_stepper.extruder_stepper.stepper
-            self.gcode.respond_info("New rotation distance after applying factor: {}".format(stepper.get_rotation_distance()[0]))
+            self.gcode.respond_info("New rotation distance after applying factor: {}".format(cur_stepper.base_rotation_dist / multiplier))
 
     def reset_multiplier(self):
         if self.debug: self.gcode.respond_info("Buffer multiplier reset")
@@ -180,6 +178,8 @@ class AFCtrigger:
         self.gcode.respond_info("Rotation distance reset : {}".format(cur_stepper.extruder_stepper.stepper.get_rotation_distance()[0]))
 
     def advance_callback(self, eventime, state):
+        for lane in self.lanes.values():
+            lane.note_sensor_edge('buffer_advance', eventime, state)
         self.advance_state = state
         if self.printer.state_message == 'Printer is ready' and self.enable:
             CUR_LANE = self.AFC.lanes[self.AFC.current]
@@ -192,6 +192,8 @@ class AFCtrigger:
         self.last_state = ADVANCE_STATE_NAME
 
     def trailing_callback(self, eventime, state):
+        for lane in self.lanes.values():
+            lane.note_sensor_edge('buffer_trailing', eventime, state)
         self.trailing_state = state
         if self.printer.state_message == 'Printer is ready' and self.enable:
             CUR_LANE = self.AFC.lanes[self.AFC.current]
@@ -64,6 +64,7 @@ class afcError:
 
                 CUR_LANE.tool_load = False
                 CUR_LANE.loaded_to_hub = False
+                CUR_LANE.staged = False
                 CUR_LANE.extruder_obj.lane_loaded = ''
                 self.AFC.save_vars()
                 self.pause = False
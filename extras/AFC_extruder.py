@@ -58,12 +58,16 @@ class AFCextruder:
         self.AFC.tools[self.name] = self
 
     def tool_start_callback(self, eventtime, state):
+        for lane in self.lanes.values():
+            lane.note_sensor_edge('tool_start', eventtime, state)
         self.tool_start_state = state
 
     def buffer_trailing_callback(self, eventtime, state):
         self.buffer_trailing = state
 
     def tool_end_callback(self, eventtime, state):
+        for lane in self.lanes.values():
+            lane.note_sensor_edge('tool_end', eventtime, state)
         self.tool_end_state = state
 
     def get_status(self, eventtime=None):
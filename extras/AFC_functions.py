@@ -6,12 +6,17 @@
 
 import os
 import re
+import time
 from configfile import error
 try:
     from extras.AFC_respond import AFCprompt
 except:
     raise error("Error trying to import AFC_respond, please rerun install-afc.sh script in your AFC-Klipper-Add-On directory then restart klipper")
 
+LANE_JOB_POLL_TIME = 0.050   # Time in seconds between checks for finished lane jobs
+AUTOTUNE_STEP = 0.25         # Fraction that speed and acceleration are raised by between autotune passes
+BENCHMARK_ITERATIONS = 10000 # Default number of times each lookup is timed by AFC_BENCHMARK_LOOKUPS
+
 def load_config(config):
     return afcFunction(config)
 
@@ -33,6 +38,7 @@ class afcFunction:
         """
         self.AFC.gcode.register_mux_command('TEST',         "LANE", lane_obj.name, self.cmd_TEST,         desc=self.cmd_TEST_help)
         self.AFC.gcode.register_mux_command('HUB_CUT_TEST', "LANE", lane_obj.name, self.cmd_HUB_CUT_TEST, desc=self.cmd_HUB_CUT_TEST_help)
+        self.AFC.gcode.register_mux_command('AUTOTUNE_LANE_SPEED', "LANE", lane_obj.name, self.cmd_AUTOTUNE_LANE_SPEED, desc=self.cmd_AUTOTUNE_LANE_SPEED_help)
 
     def register_hub_macros(self, hub_obj):
         """
@@ -50,9 +56,18 @@ class afcFunction:
         and assigns it to the instance variable `self.AFC`.
         """
         self.AFC = self.printer.lookup_object('AFC')
+        # Objects used by state checks and led updates, looked up once here since they are called on every
+        #  tool change and sensor event
+        self.toolhead = self.printer.lookup_object('toolhead')
+        self.kinematics = self.toolhead.get_kinematics()
+        self.idle_timeout = self.printer.lookup_object('idle_timeout')
+        self.print_stats = self.printer.lookup_object('print_stats', None)
+        self.pause_resume = self.printer.lookup_object('pause_resume', None)
+        self.led_objects = {}
         self.AFC.gcode.register_command('CALIBRATE_AFC'  , self.cmd_CALIBRATE_AFC  , desc=self.cmd_CALIBRATE_AFC_help)
         self.AFC.gcode.register_command('AFC_CALIBRATION', self.cmd_AFC_CALIBRATION, desc=self.cmd_AFC_CALIBRATION_help)
         self.AFC.gcode.register_command('ALL_CALIBRATION', self.cmd_ALL_CALIBRATION, desc=self.cmd_ALL_CALIBRATION_help)
+        self.AFC.gcode.register_command('AFC_BENCHMARK_LOOKUPS', self.cmd_AFC_BENCHMARK_LOOKUPS, desc=self.cmd_AFC_BENCHMARK_LOOKUPS_help)
 
     cmd_AFC_CALIBRATION_help = 'open prompt to begin calibration by selecting Unit to calibrate'
     def cmd_AFC_CALIBRATION(self, gcmd):
@@ -171,10 +186,10 @@ class afcFunction:
                     if(not checked): return
                     cal_msg += msg
                 else:
-                    # Calibrate all lanes if no specific lane is provided
-                    for CUR_LANE in self.AFC.lanes.values():
-                        # Calibrate the specific lane
-                        checked, msg = CUR_LANE.unit_obj.calibrate_lane(CUR_LANE, tol)
+                    # Calibrate all lanes if no specific lane is provided, lanes on different hubs calibrate at the same time
+                    results = self.run_lane_jobs(list(self.AFC.lanes.values()),
+                                                 lambda CUR_LANE: CUR_LANE.unit_obj.calibrate_lane(CUR_LANE, tol), uses_hub=True)
+                    for checked, msg in results.values():
                         if(not checked): return
                         cal_msg += msg
             else:
@@ -187,9 +202,9 @@ class afcFunction:
                     CUR_UNIT = self.AFC.units[unit]
                     self.AFC.gcode.respond_info('{}'.format(CUR_UNIT.name))
                     # Calibrate all lanes if no specific lane is provided
-                    for CUR_LANE in CUR_UNIT.lanes.values():
-                        # Calibrate the specific lane
-                        checked, msg = CUR_UNIT.calibrate_lane(CUR_LANE, tol)
+                    results = self.run_lane_jobs(list(CUR_UNIT.lanes.values()),
+                                                 lambda CUR_LANE: CUR_UNIT.calibrate_lane(CUR_LANE, tol), uses_hub=True)
+                    for checked, msg in results.values():
                         if(not checked): return
                         cal_msg += msg
         else:
@@ -204,9 +219,10 @@ class afcFunction:
             CUR_LANE=self.AFC.lanes[afc_bl]
             CUR_LANE.unit_obj.calibrate_bowden(CUR_LANE, dis, tol)
 
-    def ConfigRewrite(self, rawsection, rawkey, rawvalue, msg=None):
+    def ConfigRewrite(self, rawsection, rawkey, rawvalue, msg=None, add_missing=False):
         taskdone = False
         sectionfound = False
+        msg = msg or ''
         # Creating regex pattern based off rawsection
         pattern = re.compile("^\[\s*{}\s*\]".format(rawsection))
         for filename in os.listdir(self.AFC.cfgloc):
@@ -214,6 +230,7 @@ class afcFunction:
             if os.path.isfile(file_path) and filename.endswith(".cfg"):
                 with open(file_path, 'r') as f:
                     dataout = ''
+                    section_end = None
                     for line in f:
                         # If previous section found and line starts with bracket, means that this line is another section
                         #  need to put sectionfound to false to not update wrong sections if rawkey is not found
@@ -223,13 +240,18 @@ class afcFunction:
                         if sectionfound == True and line.startswith(rawkey):
                             comments = ""
                             try:
-                                comments = line.index('#')
+                                comments = " " + line[line.index('#'):].rstrip()
                             except:
                                 pass
                             line = "{}: {}{}\n".format(rawkey, rawvalue, comments )
                             sectionfound = False
                             taskdone = True
                         dataout += line
+                        # Keep track of where section header is so missing keys can be added below it
+                        if sectionfound and section_end is None: section_end = len(dataout)
+                if add_missing and not taskdone and section_end is not None:
+                    dataout = dataout[:section_end] + "{}: {}\n".format(rawkey, rawvalue) + dataout[section_end:]
+                    taskdone = True
                 if taskdone:
                     f=open(file_path, 'w')
                     f.write(dataout)
@@ -256,8 +278,9 @@ class afcFunction:
         self.AFC.save_vars()
 
     def is_homed(self):
+        # Kinematics is looked up once at connect, homed axes come from its public status
         curtime = self.AFC.reactor.monotonic()
-        kin_status = self.AFC.toolhead.get_kinematics().get_status(curtime)
+        kin_status = self.kinematics.get_status(curtime)
         if ('x' not in kin_status['homed_axes'] or 'y' not in kin_status['homed_axes'] or 'z' not in kin_status['homed_axes']):
             return False
         else:
@@ -269,9 +292,7 @@ class afcFunction:
 
         :return boolean: True if anything in the printer is moving
         '''
-        eventtime = self.AFC.reactor.monotonic()
-        idle_timeout = self.printer.lookup_object("idle_timeout")
-        return idle_timeout.get_status(eventtime)["state"] == "Printing"
+        return self.idle_timeout.state == "Printing"
 
     def is_printing(self, check_movement=False):
         '''
@@ -281,31 +302,79 @@ class afcFunction:
 
         :return boolean: True if printer is printing an object or if printer is moving when `check_movement` is True
         '''
-        eventtime = self.AFC.reactor.monotonic()
-        print_stats = self.printer.lookup_object("print_stats")
         moving = False
 
         if check_movement:
             moving = self.is_moving()
 
-        return print_stats.get_status(eventtime)["state"] == "printing" or moving
+        printing = self.print_stats is not None and self.print_stats.state == "printing"
+        return printing or moving
 
     def is_paused(self):
-        eventtime = self.AFC.reactor.monotonic()
-        pause_resume = self.printer.lookup_object("pause_resume")
-        return bool(pause_resume.get_status(eventtime)["is_paused"])
+        return self.pause_resume is not None and bool(self.pause_resume.is_paused)
+
+    def run_lane_jobs(self, lanes, job, uses_hub=False):
+        """
+        Runs `job` for multiple lanes at the same time so lanes that do not depend on each other move together.
+        Each job runs in its own reactor callback, number of lanes running at once in a unit is limited by the
+        units max_concurrent_lanes and when `uses_hub` is True only one lane per hub runs at a time since lanes
+        share the hub sensor.
+
+        :param lanes: List of lane objects to run job for
+        :param job: Function that takes a lane object, its return value is stored as the lanes result
+        :param uses_hub: Set to True when job relies on the hub sensor
+        :return dict: Results of job keyed by lane name, in the same order as lanes
+        """
+        reactor = self.AFC.reactor
+        results = {}
+        errors = []
+        active_units = {}
+        active_hubs = []
+        pending = list(lanes)
+        running = []
+
+        def run_job(CUR_LANE, completion):
+            try:
+                results[CUR_LANE.name] = job(CUR_LANE)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                active_units[CUR_LANE.unit] -= 1
+                if uses_hub: active_hubs.remove(CUR_LANE.hub)
+                completion.complete(True)
+
+        while pending or running:
+            for CUR_LANE in list(pending):
+                if active_units.get(CUR_LANE.unit, 0) >= CUR_LANE.unit_obj.max_concurrent_lanes:
+                    continue
+                if uses_hub and CUR_LANE.hub in active_hubs:
+                    continue
+                pending.remove(CUR_LANE)
+                active_units[CUR_LANE.unit] = active_units.get(CUR_LANE.unit, 0) + 1
+                if uses_hub: active_hubs.append(CUR_LANE.hub)
+                completion = reactor.completion()
+                running.append(completion)
+                reactor.register_callback(lambda eventtime, lane=CUR_LANE, c=completion: run_job(lane, c))
+
+            reactor.pause(reactor.monotonic() + LANE_JOB_POLL_TIME)
+            running = [c for c in running if not c.test()]
+
+        if errors:
+            raise errors[0]
+        return {CUR_LANE.name: results.get(CUR_LANE.name) for CUR_LANE in lanes}
 
     def afc_led (self, status, idx=None):
         if idx == None:
             return
         # Try to find led object, if not found print error to console for user to see
         afc_object = 'AFC_led '+ idx.split(':')[0]
-        try:
-            led = self.printer.lookup_object(afc_object)
-            led.led_change(int(idx.split(':')[1]), status)
-        except:
+        led = self.led_objects.get(afc_object)
+        if led is None:
+            led = self.led_objects[afc_object] = self.printer.lookup_object(afc_object, None)
+        if led is None:
             error_string = "Error: Cannot find [{}] in config, make sure led_index in config is correct for AFC_stepper {}".format(afc_object, idx.split(':')[-1])
             self.AFC.gcode.respond_info( error_string)
+            return
         led.led_change(int(idx.split(':')[1]), status)
 
     def get_filament_status(self, CUR_LANE):
@@ -410,9 +479,234 @@ class afcFunction:
             return
         CUR_LANE = self.AFC.lanes[lane]
         CUR_HUB = CUR_LANE.hub_obj
-        CUR_HUB.hub_cut(CUR_LANE)
+        if not CUR_HUB.hub_cut(CUR_LANE):
+            self.AFC.ERROR.AFC_error('Hub cut failed, hub sensor did not reach cut position for {}'.format(lane), pause=False)
+            return
         self.AFC.gcode.respond_info('Hub cut Done!')
 
+    cmd_AUTOTUNE_LANE_SPEED_help = "Find highest reliable move speeds and accelerations for a lane"
+    def cmd_AUTOTUNE_LANE_SPEED(self, gcmd):
+        """
+        This function finds the highest speeds and accelerations a lane can move filament at without losing steps.
+        Lane is moved back from the hub sensor and towards it again at increasing speeds and accelerations, and the
+        distance moved until the hub sensor triggers is compared to the distance the lane was moved back. A value is
+        reliable if every repeat triggers the hub sensor within the tolerance. Long moves are tested over DISTANCE
+        and short moves over twice the lanes short_move_dis. Requires the hub sensor to be an endstop so the trigger
+        distance is measured by the MCU. Sweeps stop at the first speed the lane cannot reach over its test distance
+        before the approach margin, use a longer DISTANCE to test higher values.
+
+        Usage: `AUTOTUNE_LANE_SPEED LANE=<lane> DISTANCE=<distance> REPEAT=<repeat> TOLERANCE=<tolerance> MAX_SPEED=<speed> MAX_ACCEL=<accel> SAVE=<0|1>`
+        Example: `AUTOTUNE_LANE_SPEED LANE=leg1 SAVE=1`
+
+        Args:
+            gcmd: The G-code command object containing the parameters for the command.
+                  Expected parameters:
+                  - LANE: The name of the lane to tune.
+                  - DISTANCE: Distance in mm to move lane back from the hub for long moves (optional, defaults to lanes dist_hub).
+                  - REPEAT: Number of times each value is tested (optional, defaults to 3).
+                  - TOLERANCE: Largest trigger distance error in mm accepted as no lost steps (optional, defaults to 1mm).
+                  - MAX_SPEED: Highest speed in mm/s to test (optional, defaults to 500).
+                  - MAX_ACCEL: Highest acceleration in mm/s^2 to test (optional, defaults to 5000).
+                  - SAVE: Set to 1 to write the values to the lanes config section (optional, defaults to 0).
+
+        Returns:
+            None
+        """
+        lane = gcmd.get('LANE', None)
+        if lane not in self.AFC.lanes:
+            self.AFC.gcode.respond_info('{} Unknown'.format(lane))
+            return
+        CUR_LANE = self.AFC.lanes[lane]
+        CUR_HUB = CUR_LANE.hub_obj
+        distance  = gcmd.get_float('DISTANCE', CUR_LANE.dist_hub, above=0.)
+        repeat    = gcmd.get_int(  'REPEAT', 3, minval=1)
+        tol       = gcmd.get_float('TOLERANCE', 1., above=0.)
+        max_speed = gcmd.get_float('MAX_SPEED', 500., above=0.)
+        max_accel = gcmd.get_float('MAX_ACCEL', 5000., above=0.)
+        save      = gcmd.get_int(  'SAVE', 0, minval=0, maxval=1)
+
+        if self.AFC.current is not None:
+            self.AFC.gcode.respond_info('Tool must be unloaded to tune lane speeds')
+            return
+        if CUR_LANE.hub == 'direct' or 'hub' not in CUR_LANE.endstops:
+            self.AFC.ERROR.AFC_error("{} needs a hub sensor endstop to tune lane speeds".format(CUR_LANE.name), pause=False)
+            return
+        if CUR_HUB.state:
+            self.AFC.gcode.respond_info('Hub is not clear, check before tuning lane speeds')
+            return
+        if not CUR_LANE.load_state:
+            self.AFC.gcode.respond_info('{} not loaded, load before tuning lane speeds'.format(CUR_LANE.name))
+            return
+
+        self.AFC.gcode.respond_info('Tuning {} speeds'.format(CUR_LANE.name))
+        CUR_LANE.do_enable(True)
+        if not self._autotune_home(CUR_LANE):
+            self.AFC.ERROR.handle_lane_failure(CUR_LANE, 'HUB NOT FOUND WHILE TUNING LANE SPEEDS\n', pause=False)
+            return
+
+        short_distance = CUR_LANE.short_move_dis * 2
+        long_speed  = self._autotune_sweep(CUR_LANE, 'long_moves_speed', CUR_LANE.long_moves_speed, max_speed, repeat, tol,
+                                           lambda value: (distance, value, CUR_LANE.long_moves_accel))
+        long_accel  = self._autotune_sweep(CUR_LANE, 'long_moves_accel', CUR_LANE.long_moves_accel, max_accel, repeat, tol,
+                                           lambda value: (distance, long_speed, value))
+        short_speed = self._autotune_sweep(CUR_LANE, 'short_moves_speed', CUR_LANE.short_moves_speed, max_speed, repeat, tol,
+                                           lambda value: (short_distance, value, CUR_LANE.short_moves_accel))
+        short_accel = self._autotune_sweep(CUR_LANE, 'short_moves_accel', CUR_LANE.short_moves_accel, max_accel, repeat, tol,
+                                           lambda value: (short_distance, short_speed, value))
+
+        # Clear hub the same way HUB_LOAD leaves lane
+        CUR_LANE.move_to_trigger('hub', CUR_HUB.move_dis * -20, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel, triggered=False)
+        CUR_LANE.move(CUR_HUB.hub_clear_move_dis * -1, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel, True)
+        CUR_LANE.loaded_to_hub = True
+        CUR_LANE.do_enable(False)
+        self.AFC.save_vars()
+
+        results = {'long_moves_speed': long_speed, 'long_moves_accel': long_accel,
+                   'short_moves_speed': short_speed, 'short_moves_accel': short_accel}
+        cal_msg = '{} tuned speeds:'.format(CUR_LANE.name)
+        for key, value in results.items():
+            cal_msg += '\n{}: New: {} Old: {}'.format(key, value, getattr(CUR_LANE, key))
+            setattr(CUR_LANE, key, value)
+        if not save:
+            self.AFC.gcode.respond_info(cal_msg)
+            return
+        for key, value in results.items():
+            self.ConfigRewrite(CUR_LANE.fullname, key, value, cal_msg, add_missing=True)
+            cal_msg = ''
+
+    def _autotune_home(self, CUR_LANE):
+        """
+        Moves lane forward until hub sensor triggers so autotune moves start from the hub trigger point
+        """
+        max_dis = CUR_LANE.dist_hub + CUR_LANE.hub_obj.move_dis + CUR_LANE.short_move_dis * 20
+        triggered, _ = CUR_LANE.move_to_trigger('hub', max_dis, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel)
+        return triggered
+
+    def _autotune_trial(self, CUR_LANE, distance, speed, accel):
+        """
+        Moves lane back from hub trigger point by `distance` and forward again until the hub sensor triggers
+
+        :return float: Difference in mm between distance moved forward and back, None if hub was not found
+        """
+        CUR_LANE.move(distance * -1, speed, accel, True)
+        approach = CUR_LANE.get_approach_moves([(distance, speed, accel)])
+        max_dis = CUR_LANE.get_approach_margin() + CUR_LANE.short_move_dis * 2
+        triggered, moved = CUR_LANE.move_to_trigger('hub', max_dis, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel,
+                                                    approach_moves=approach)
+        if not triggered:
+            return None
+        return moved - distance
+
+    def _autotune_sweep(self, CUR_LANE, name, start, limit, repeat, tol, get_move):
+        """
+        Raises a value by AUTOTUNE_STEP from `start` up to `limit` until a trial loses steps. Sweep also stops at
+        the first value whose speed the lane cannot reach over the trial distance, since it would not be tested.
+
+        :param name: Name of value being tuned, used for messages
+        :param get_move: Function returning (distance, speed, accel) to test for a value
+        :return float: Highest value where all trials stayed within `tol`, `start` if none did
+        """
+        values = []
+        value = start
+        while value < limit:
+            values.append(round(value))
+            value *= 1. + AUTOTUNE_STEP
+        values.append(limit)
+
+        best = None
+        for value in values:
+            trial_dis, speed, accel = get_move(value)
+            # Forward move only runs at speed until approach margin before the hub
+            reach_dis = trial_dis - CUR_LANE.get_approach_margin()
+            if reach_dis <= 0.:
+                reach_dis = trial_dis
+            if speed ** 2 / accel > reach_dis:
+                self.AFC.gcode.respond_info('{} {}: {} not reached over {:.1f}mm, use a longer DISTANCE to test higher values'.format(
+                    CUR_LANE.name, name, value, reach_dis))
+                break
+            errors = []
+            for _ in range(repeat):
+                error = self._autotune_trial(CUR_LANE, trial_dis, speed, accel)
+                if error is None:
+                    break
+                errors.append(error)
+                if abs(error) > tol:
+                    break
+            if len(errors) < repeat or max(abs(error) for error in errors) > tol:
+                self.AFC.gcode.respond_info('{} {}: {} lost steps'.format(CUR_LANE.name, name, value))
+                # Start next sweep from a known position again
+                if error is None and not self._autotune_home(CUR_LANE):
+                    raise self.AFC.gcode.error('{} hub not found while tuning {}'.format(CUR_LANE.name, name))
+                break
+            self.AFC.gcode.respond_info('{} {}: {} max error {:.2f}mm'.format(
+                CUR_LANE.name, name, value, max(abs(error) for error in errors)))
+            best = value
+        if best is None:
+            self.AFC.gcode.respond_info('{} {}: no reliable value found, keeping {}'.format(CUR_LANE.name, name, start))
+            return start
+        return best
+
+    def _time_calls(self, func, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - start) / iterations * 1e6
+
+    cmd_AFC_BENCHMARK_LOOKUPS_help = "Time object lookups done on tool changes and sensor events"
+    def cmd_AFC_BENCHMARK_LOOKUPS(self, gcmd):
+        """
+        This function times the object lookups and status reads that AFC used to do on every tool change and
+        sensor event against the cached objects and direct reads used now, and reports the host time in
+        microseconds saved for each. Totals count each lookup once per tool change or sensor event.
+
+        Usage: `AFC_BENCHMARK_LOOKUPS ITERATIONS=<iterations>`
+        Example: `AFC_BENCHMARK_LOOKUPS ITERATIONS=10000`
+
+        Args:
+            gcmd: The G-code command object containing the parameters for the command.
+                  Expected parameter:
+                  - ITERATIONS: Number of times each lookup is timed, defaults to 10000.
+
+        NO_DOC: True
+
+        Returns:
+            None
+        """
+        iterations = gcmd.get_int('ITERATIONS', BENCHMARK_ITERATIONS, minval=1)
+        eventtime = self.AFC.reactor.monotonic()
+        lookup = self.printer.lookup_object
+        CUR_LANE = next(iter(self.AFC.lanes.values()), None)
+
+        # (name, lookup done before, lookup done now, runs on every sensor event)
+        checks = [
+            ('toolhead', lambda: lookup('toolhead'), lambda: CUR_LANE.toolhead, True),
+            ('is_homed', lambda: self.toolhead.get_kinematics().get_status(eventtime)['homed_axes'], self.is_homed, False),
+            ('is_moving', lambda: lookup('idle_timeout').get_status(eventtime)['state'] == 'Printing', self.is_moving, False),
+            ('bypass', lambda: lookup('filament_switch_sensor bypass', None), lambda: self.AFC.bypass, False),
+        ]
+        if self.print_stats is not None:
+            checks.append(('is_printing', lambda: lookup('print_stats').get_status(eventtime)['state'] == 'printing',
+                           self.is_printing, False))
+        if self.pause_resume is not None:
+            checks.append(('is_paused', lambda: lookup('pause_resume').get_status(eventtime)['is_paused'],
+                           self.is_paused, False))
+        if CUR_LANE is not None and CUR_LANE.extruder_obj is not None:
+            checks.append(('extruder', lambda: lookup('AFC_extruder ' + CUR_LANE.extruder_name),
+                           lambda: CUR_LANE.extruder_obj, True))
+        if CUR_LANE is None:
+            checks = [check for check in checks if check[0] != 'toolhead']
+
+        msg = "Lookup times in microseconds per call, before / now:"
+        tool_change = sensor_event = 0.
+        for name, before, now, on_sensor in checks:
+            before_us = self._time_calls(before, iterations)
+            now_us = self._time_calls(now, iterations)
+            msg += "\n  {}: {:.2f} / {:.2f}".format(name, before_us, now_us)
+            tool_change += before_us - now_us
+            if on_sensor: sensor_event += before_us - now_us
+        msg += "\nSaved per tool change: {:.2f}us, per sensor event: {:.2f}us".format(tool_change, sensor_event)
+        self.AFC.gcode.respond_info(msg)
+
     cmd_TEST_help = "Test Assist Motors"
     def cmd_TEST(self, gcmd):
         """
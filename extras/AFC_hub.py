@@ -67,23 +67,33 @@ class afc_hub:
         self.printer.send_event("afc_hub:register_macros", self)
 
     def switch_pin_callback(self, eventtime, state):
+        for lane in self.lanes.values():
+            lane.note_sensor_edge('hub', eventtime, state)
         self.state = state
 
     def hub_cut(self, CUR_LANE):
+        """
+        Cuts filament of CUR_LANE at the hub. Filament is not cut if the hub sensor does not reach an expected
+        state, since the cut position would not be known.
+
+        :param CUR_LANE: Lane object to cut filament for
+        :return bool: True if filament was cut, False if hub sensor did not trigger or clear
+        """
         servo_string = 'SET_SERVO SERVO={servo} ANGLE={{angle}}'.format(servo=self.cut_servo_name)
 
         # Prep the servo for cutting.
         self.gcode.run_script_from_command(servo_string.format(angle=self.cut_servo_prep_angle))
-        # Load the lane until the hub is triggered.
-        while not self.state:
-            CUR_LANE.move( self.move_dis, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel)
-
-        # To have an accurate reference position for `hub_cut_dist`, move back and forth in smaller steps
-        # to find the point where the hub just triggers.
-        while self.state:
-            CUR_LANE.move(-10, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel, self.assisted_retract)
-        while not self.state:
-            CUR_LANE.move(2, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel)
+        # Load the lane until the hub is triggered. To have an accurate reference position for `hub_cut_dist`,
+        # back off the hub and approach it again so the lane stops right where the hub just triggers.
+        for distance, triggered, assist_active in ((self.move_dis * 20, True, False),
+                                                   (-self.move_dis, False, self.assisted_retract),
+                                                   (self.move_dis, True, False)):
+            reached, _ = CUR_LANE.move_to_trigger('hub', distance, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel,
+                                                  triggered=triggered, assist_active=assist_active)
+            if not reached:
+                # Align bowden tube (reset)
+                self.gcode.run_script_from_command(servo_string.format(angle=self.cut_servo_pass_angle))
+                return False
 
         # Feed the `hub_cut_dist` amount.
         CUR_LANE.move( self.cut_dist, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel)
@@ -107,6 +117,7 @@ class afc_hub:
 
         # Retract lane by `hub_cut_clear`.
         CUR_LANE.move(-self.cut_clear, CUR_LANE.short_moves_speed, CUR_LANE.short_moves_accel, self.assisted_retract)
+        return True
 
     def get_status(self, eventtime=None):
         self.response = {}
@@ -120,6 +131,10 @@ class afc_hub:
         self.response['cut_servo_clip_angle'] = self.cut_servo_clip_angle
         self.response['cut_servo_prep_angle'] = self.cut_servo_prep_angle
         self.response['lanes'] = [lane.name for lane in self.lanes.values()]
+        # Average of bowden lengths learned by lanes going through this hub
+        bowden_lengths = [lane.path_lengths['bowden'] for lane in self.lanes.values() if 'bowden' in lane.path_lengths]
+        bowden_lengths = [path_length.length() for path_length in bowden_lengths if path_length.is_learned()]
+        self.response['learned_bowden_length'] = round(sum(bowden_lengths) / len(bowden_lengths), 2) if bowden_lengths else None
 
         return self.response
 
@@ -42,6 +42,7 @@ class AFCled:
         self.color_data = bytearray(len(self.color_map))
         self.update_color_data(self.led_helper.get_status()['color_data'])
         self.old_color_data = bytearray([d ^ 1 for d in self.color_data])
+        self.toolhead = None
         # Register callbacks
         printer.register_event_handler("klippy:connect", self.send_data)
 
@@ -122,8 +123,9 @@ class AFCled:
             set_color_fn(index, colors)
             if transmit:
                 check_transmit_fn(print_time)
-        toolhead = self.printer.lookup_object('toolhead')
-        toolhead.register_lookahead_callback(lookahead_bgfunc)
+        if self.toolhead is None:
+            self.toolhead = self.printer.lookup_object('toolhead')
+        self.toolhead.register_lookahead_callback(lookahead_bgfunc)
 
 def load_config_prefix(config):
     return AFCled(config)
@@ -0,0 +1,158 @@
+# Armored Turtle Automated Filament Changer
+#
+# Copyright (C) 2024 Armored Turtle
+#
+# This file may be distributed under the terms of the GNU GPLv3 license.
+
+import os
+
+LOOKAHEAD_INTERVAL = 5.         # Time in seconds between lookahead scans while printing
+LOOKAHEAD_CONTINUE_INTERVAL = .5 # Time in seconds until next scan when last scan stopped at its byte limit
+LOOKAHEAD_CHUNK_SIZE = 16384    # Number of bytes read from print file at once
+
+def load_config(config):
+    return afcLookahead(config)
+
+class afcLookahead:
+    """
+    Reads ahead in the file being printed by virtual_sdcard and keeps a queue of the next tool changes, which is
+    reported in status. The file is scanned from where the last scan stopped and each scan reads at most
+    `lookahead_max_bytes`, so time spent on the reactor per scan stays bounded on large files. Scans that stop at
+    the byte limit are continued shortly after instead of in one pass.
+    """
+    def __init__(self, config):
+        self.printer = config.get_printer()
+        self.printer.register_event_handler("klippy:connect", self.handle_connect)
+        self.printer.register_event_handler("klippy:ready", self.handle_ready)
+        self.tool_changes = []
+        self._reset(None)
+
+    def handle_connect(self):
+        """
+        Handle the connection event.
+        This function is called when the printer connects. It looks up the AFC and virtual_sdcard objects.
+        """
+        self.AFC = self.printer.lookup_object('AFC')
+        self.reactor = self.AFC.reactor
+        self.virtual_sdcard = self.printer.lookup_object('virtual_sdcard', None)
+        self.max_changes = self.AFC.lookahead_tool_changes
+        self.max_bytes = self.AFC.lookahead_max_bytes
+
+    def handle_ready(self):
+        if self.virtual_sdcard is not None and self.max_changes:
+            self.reactor.register_timer(self._lookahead_event, self.reactor.NOW)
+
+    def _reset(self, file_path):
+        self.file_path = file_path
+        self.file_position = 0
+        self.scan_pos = 0
+        self.partial = b''
+        self.absolute_extrude = True
+        self.last_e = 0.
+        self.extrusion = 0.
+        self.tool_changes = []
+
+    def _lookahead_event(self, eventtime):
+        if self.update():
+            return eventtime + LOOKAHEAD_CONTINUE_INTERVAL
+        return eventtime + LOOKAHEAD_INTERVAL
+
+    def _sync_extrude_state(self):
+        # Extrude mode and E position are taken from where gcode_move is when scan has to start over
+        gcode_move = self.AFC.gcode_move
+        self.absolute_extrude = gcode_move.absolute_extrude
+        self.last_e = gcode_move.last_position[3] - gcode_move.base_position[3]
+
+    def update(self):
+        """
+        Drops tool changes virtual_sdcard has read past and scans ahead until `max_changes` tool changes are
+        queued, the end of file is reached or `max_bytes` have been read
+
+        :return bool: True if scan stopped at `max_bytes` and there is more of the file to scan
+        """
+        vsd = self.virtual_sdcard
+        file_path = vsd.file_path() if vsd is not None and vsd.is_active() else None
+        if file_path is None:
+            if self.file_path is not None: self._reset(None)
+            return False
+        file_position = vsd.file_position
+        if file_path != self.file_path or file_position < self.file_position:
+            # New print or file position moved back, start again from where virtual_sdcard is
+            self._reset(file_path)
+            self.scan_pos = file_position
+            self._sync_extrude_state()
+        elif self.scan_pos < file_position:
+            # Scan fell behind the print, skip ahead without counting extrusion that was missed
+            self.scan_pos = file_position
+            self.partial = b''
+            self.extrusion = 0.
+            self._sync_extrude_state()
+        self.file_position = file_position
+        self.tool_changes = [change for change in self.tool_changes if change['offset'] >= file_position]
+
+        read = 0
+        try:
+            with open(file_path, 'rb') as f:
+                f.seek(self.scan_pos)
+                while len(self.tool_changes) < self.max_changes:
+                    if read >= self.max_bytes:
+                        return True
+                    data = f.read(min(LOOKAHEAD_CHUNK_SIZE, self.max_bytes - read))
+                    if not data:
+                        break
+                    read += len(data)
+                    self._scan(data)
+        except (IOError, OSError):
+            self._reset(None)
+        return False
+
+    def _scan(self, data):
+        # Lines can be split between reads, the unfinished last line is kept for the next read
+        offset = self.scan_pos - len(self.partial)
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self._scan_line(line, offset)
+            offset += len(line) + 1
+        self.scan_pos += len(data)
+
+    def _scan_line(self, line, offset):
+        line = line.split(b';', 1)[0].strip().upper()
+        if not line:
+            return
+        parts = line.decode('ascii', 'ignore').split()
+        cmd = parts[0]
+        if cmd in ('G0', 'G1', 'G2', 'G3'):
+            for part in parts[1:]:
+                if part.startswith('E'):
+                    try:
+                        e = float(part[1:])
+                    except ValueError:
+                        return
+                    if self.absolute_extrude:
+                        self.extrusion += e - self.last_e
+                        self.last_e = e
+                    else:
+                        self.extrusion += e
+        elif cmd == 'G92':
+            for part in parts[1:]:
+                if part.startswith('E'):
+                    try:
+                        self.last_e = float(part[1:])
+                    except ValueError:
+                        pass
+        elif cmd == 'M82':
+            self.absolute_extrude = True
+        elif cmd == 'M83':
+            self.absolute_extrude = False
+        elif cmd in self.AFC.tool_cmds:
+            self.tool_changes.append({'tool': cmd, 'lane': self.AFC.tool_cmds[cmd], 'offset': offset,
+                                      'extrusion': round(self.extrusion, 2)})
+            self.extrusion = 0.
+
+    def get_status(self, eventtime=None):
+        response = {}
+        response['file'] = os.path.basename(self.file_path) if self.file_path else None
+        response['scan_position'] = self.scan_pos
+        response['tool_changes'] = list(self.tool_changes)
+        return response
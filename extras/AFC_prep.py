@@ -103,7 +103,14 @@ class afcPrep:
                     if 'loaded_to_hub' in units[CUR_LANE.unit][CUR_LANE.name]: CUR_LANE.loaded_to_hub = units[CUR_LANE.unit][CUR_LANE.name]['loaded_to_hub']
                     if 'tool_loaded' in units[CUR_LANE.unit][CUR_LANE.name]: CUR_LANE.tool_loaded = units[CUR_LANE.unit][CUR_LANE.name]['tool_loaded']
                     if 'status' in units[CUR_LANE.unit][CUR_LANE.name]: CUR_LANE.status = units[CUR_LANE.unit][CUR_LANE.name]['status']
-
+                    # Only restore corrected rotation distance if rotation_distance in config has not been changed since
+                    if (CUR_LANE.auto_rotation_distance and 'rotation_distance' in units[CUR_LANE.unit][CUR_LANE.name]
+                        and units[CUR_LANE.unit][CUR_LANE.name].get('config_rotation_distance') == CUR_LANE.config_rotation_dist):
+                        CUR_LANE.set_base_rotation_distance(units[CUR_LANE.unit][CUR_LANE.name]['rotation_distance'])
+                    # Learned path lengths are saved in units of the restored rotation distance
+                    if 'path_lengths' in units[CUR_LANE.unit][CUR_LANE.name]: CUR_LANE.load_path_lengths(units[CUR_LANE.unit][CUR_LANE.name]['path_lengths'])
+
+        prep_lanes = []
         for UNIT in self.AFC.units.keys():
             try: CUR_UNIT = self.AFC.units[UNIT]
             except:
@@ -111,6 +118,18 @@ class afcPrep:
                 self.AFC.ERROR.AFC_error(error_string, False)
                 return
             self.AFC.gcode.respond_info(CUR_UNIT.type + ' ' + UNIT +' Prepping lanes')
+            prep_lanes.extend(CUR_UNIT.lanes.values())
+
+        # Assigning T commands before testing lanes so commands are assigned in lane order
+        if self.assignTcmd:
+            for LANE in prep_lanes:
+                self.AFC.FUNCTION.TcmdAssign(LANE)
+
+        # Test lanes in all units at the same time, number of lanes moving at once is limited per unit
+        lane_results = self.AFC.FUNCTION.run_lane_jobs(prep_lanes,
+                                                       lambda LANE: LANE.unit_obj.system_Test(LANE, self.delay, False, self.enable))
+
+        for CUR_UNIT in self.AFC.units.values():
             lanes_for_first_hub = []
             hub_name = ""
             LaneCheck = True
@@ -120,7 +139,7 @@ class afcPrep:
                     lanes_for_first_hub.append(LANE.name)
                     hub_name = LANE.hub_obj.fullname
 
-                if not CUR_UNIT.system_Test(LANE, self.delay, self.assignTcmd, self.enable):
+                if not lane_results[LANE.name]:
                     LaneCheck = False
             # Warn user if multiple hubs were found and hub was not assigned to unit/stepper
             if len(lanes_for_first_hub) != 0:
@@ -131,11 +150,8 @@ class afcPrep:
                 self.AFC.gcode.respond_raw(CUR_UNIT.logo)
             else:
                 self.AFC.gcode.respond_raw(CUR_UNIT.logo_error)
-        try:
-            bypass = self.printer.lookup_object('filament_switch_sensor bypass').runout_helper
-            if bypass.filament_present == True:
-              self.AFC.gcode.respond_info("Filament loaded in bypass, not doing toolchange")
-        except: bypass = None
+        if self.AFC.bypass is not None and self.AFC.bypass.runout_helper.filament_present:
+            self.AFC.gcode.respond_info("Filament loaded in bypass, not doing toolchange")
 
         # Defaulting to no active spool, putting at end so endpoint has time to register
         if self.AFC.current is None:
@@ -7,10 +7,10 @@
 import math
 import chelper
 from kinematics import extruder
-from . import AFC_assist
+from . import AFC_assist, homing
 from configfile import error
 try:
-    from extras.AFC_utils import add_filament_switch
+    from extras.AFC_utils import add_filament_switch, add_endstop
 except:
     raise error("Error trying to import AFC_utils, please rerun install-afc.sh script in your AFC-Klipper-Add-On directory then restart klipper")
 
@@ -19,6 +19,33 @@ BACKGROUND_PRIORITY_CLOCK = 0x7fffffff00000000
 BIT_MAX_TIME=.000004
 RESET_MIN_TIME=.000050
 MAX_MCU_SIZE = 500  # Sanity check on LED chain length
+
+# Lane moves
+MOVE_LEAD_TIME = 0.500      # Time in seconds that lane steps are queued ahead of the mcu
+MAX_CHUNK_STEPS = 10000     # Maximum number of steps generated for a lane move at once
+LANE_MOVE_START_DELAY = 0.100   # Time in seconds from when a lane move is scheduled to when it can start at the earliest
+MOVE_HISTORY_EXPIRE = 30.       # Time in seconds lane moves are kept in trapq history to look up sensor trigger positions
+MAX_HISTORY_MOVES = 64          # Maximum number of trapq history moves read when looking up lane travel
+ASSIST_PROFILE_TIME = AFC_assist.PIN_MIN_TIME  # Time in seconds between espooler speed changes while lane accelerates or decelerates
+
+# Learned path lengths
+PATH_SAMPLES = 9            # Number of recent sensor trigger distances kept for each lane path
+PATH_MIN_SAMPLES = 3        # Number of samples needed before a learned path length is used
+PATH_MARGIN_SPREAD = 4.     # Approach margin used for a learned path in multiples of its spread
+PATH_MIN_MARGIN = 2.        # Smallest approach margin in mm used for a learned path
+PATH_LEARNED_RETRIES = 5    # Number of short_move_dis past the approach margin to look for a sensor on a learned path
+ROTATION_MIN_LANES = 3      # Number of lanes with a learned bowden length needed on a hub before rotation distance is corrected
+ROTATION_MIN_CORRECTION = 0.002 # Relative rotation distance error below which rotation distance is left unchanged
+ROTATION_MAX_CORRECTION = 0.02  # Largest relative change made to rotation distance at once
+
+BOOST_MIN_DISTANCE = 200.   # Lane moves at least this long in mm run at boost_current when it is set
+
+# Spool inertia acceleration
+SPOOL_REFERENCE_WEIGHT = 1000.  # Filament weight in g of the spool configured accelerations are used for
+
+# Jam detection
+LOAD_SAMPLES = 9            # Number of recent driver load readings kept for each move speed
+LOAD_MIN_SAMPLES = 3        # Number of samples needed before a learned jam threshold is used
 def calc_move_time(dist, speed, accel):
     """
     Calculate the movement time and parameters for a given distance, speed, and acceleration.
@@ -49,6 +76,381 @@ def calc_move_time(dist, speed, accel):
     cruise_t = (dist - accel_decel_d) / speed
     return axis_r, accel_t, cruise_t, speed
 
+def calc_junction_moves(moves):
+    """
+    Plans a chain of lane moves so consecutive moves in the same direction are joined without stopping.
+    The velocity at each junction is limited by the slower of the two moves and by how fast the lane can
+    accelerate and decelerate over the neighbouring moves, so the lane only stops at the end of the chain
+    or where it changes direction.
+    Parameters:
+    moves (list): List of (distance, speed, accel) tuples.
+    Returns:
+    list: A list of tuples, one per move with a distance, containing:
+        - axis_r (float): The direction of the axis (1 for positive, -1 for negative).
+        - accel_t (float): The time spent accelerating.
+        - cruise_t (float): The time spent cruising at constant speed.
+        - decel_t (float): The time spent decelerating.
+        - start_v (float): The speed at the start of the move.
+        - cruise_v (float): The cruise speed.
+        - accel (float): The acceleration of the move.
+    """
+    moves = [move for move in moves if move[0]]
+    # Maximum velocity squared at the start of each move, last entry is the end of the chain
+    junction_v2 = [0.] * (len(moves) + 1)
+    for i in range(1, len(moves)):
+        prev_dist, prev_speed, _ = moves[i-1]
+        dist, speed, _ = moves[i]
+        if (prev_dist > 0.) == (dist > 0.):
+            junction_v2[i] = min(prev_speed, speed) ** 2
+    # Limit junctions to what the lane can decelerate from before the next stop
+    for i in range(len(moves) - 1, -1, -1):
+        dist, speed, accel = moves[i]
+        junction_v2[i] = min(junction_v2[i], junction_v2[i+1] + 2. * accel * abs(dist))
+    # Limit junctions to what the lane can accelerate to
+    for i in range(len(moves)):
+        dist, speed, accel = moves[i]
+        junction_v2[i+1] = min(junction_v2[i+1], junction_v2[i] + 2. * accel * abs(dist))
+
+    planned = []
+    for i, (dist, speed, accel) in enumerate(moves):
+        axis_r = 1. if dist > 0. else -1.
+        dist = abs(dist)
+        if not accel:
+            planned.append((axis_r, 0., dist / speed, 0., speed, speed, 0.))
+            continue
+        start_v2, end_v2 = junction_v2[i], junction_v2[i+1]
+        cruise_v2 = min(speed ** 2, (start_v2 + end_v2) / 2. + accel * dist)
+        start_v, end_v, cruise_v = math.sqrt(start_v2), math.sqrt(end_v2), math.sqrt(cruise_v2)
+        accel_d = (cruise_v2 - start_v2) / (2. * accel)
+        decel_d = (cruise_v2 - end_v2) / (2. * accel)
+        accel_t = (cruise_v - start_v) / accel
+        decel_t = (cruise_v - end_v) / accel
+        cruise_t = max(0., dist - accel_d - decel_d) / cruise_v
+        planned.append((axis_r, accel_t, cruise_t, decel_t, start_v, cruise_v, accel))
+    return planned
+
+class AFCPathLength:
+    """
+    Rolling estimate of how far a lane moves along a path before a sensor changes state. Keeps the most recent
+    distances and uses the median so a single slipped or interrupted move does not throw off the estimate.
+    """
+    def __init__(self, samples=None):
+        self.samples = [float(sample) for sample in (samples or [])][-PATH_SAMPLES:]
+
+    def add(self, distance):
+        self.samples.append(abs(distance))
+        del self.samples[:-PATH_SAMPLES]
+
+    @staticmethod
+    def _median(values):
+        values = sorted(values)
+        mid = len(values) // 2
+        if len(values) % 2:
+            return values[mid]
+        return (values[mid - 1] + values[mid]) / 2.
+
+    def is_learned(self):
+        return len(self.samples) >= PATH_MIN_SAMPLES
+
+    def length(self):
+        """
+        Returns median of stored distances in mm
+        """
+        return self._median(self.samples)
+
+    def spread(self):
+        """
+        Returns median absolute deviation of stored distances in mm
+        """
+        length = self.length()
+        return self._median([abs(sample - length) for sample in self.samples])
+
+    def scale(self, factor):
+        """
+        Rescales stored distances after the lanes rotation distance has been changed by `factor`
+        """
+        self.samples = [sample * factor for sample in self.samples]
+
+    def get_status(self):
+        response = {}
+        response['samples'] = [round(sample, 2) for sample in self.samples]
+        response['learned'] = self.is_learned()
+        response['length'] = round(self.length(), 2) if self.samples else None
+        response['spread'] = round(self.spread(), 2) if self.samples else None
+        return response
+
+class AFCDriverLoad:
+    """
+    Watches lane stepper driver load during lane moves to detect jams. Load is read as the TMC StallGuard
+    result, which drops as the motor works harder. Readings are only taken while a move is cruising and a
+    baseline is learned for each cruise speed from moves that completed, a jam is reported once a reading drops
+    below `load_ratio` times the baseline or below `threshold` when one is set.
+
+    Readings come from `read_load`, any callable that returns the current StallGuard result or None can be
+    passed so this can be run against a simulated register source.
+    """
+    def __init__(self, read_load, load_ratio, threshold=0.):
+        self.read_load = read_load
+        self.load_ratio = load_ratio
+        self.threshold = threshold
+        self.samples = {}
+        self.windows = []
+        self.readings = {}
+
+    def start(self, segments):
+        """
+        Starts watching a move, only cruise phases of `segments` are checked
+
+        :param segments: List of (print_time, accel_t, cruise_t, decel_t, start_v, cruise_v, accel) tuples for the move
+        """
+        self.windows = [(print_time + accel_t, print_time + accel_t + cruise_t, round(cruise_v))
+                        for print_time, accel_t, cruise_t, decel_t, start_v, cruise_v, accel in segments
+                        if cruise_t > 0.]
+        self.readings = {}
+
+    def get_threshold(self, speed):
+        if self.threshold:
+            return self.threshold
+        samples = self.samples.get(speed, [])
+        if len(samples) < LOAD_MIN_SAMPLES:
+            return None
+        return AFCPathLength._median(samples) * self.load_ratio
+
+    def check(self, print_time):
+        """
+        Reads driver load when move is cruising at `print_time`
+
+        :return bool: True if reading is below jam threshold
+        """
+        for start_time, end_time, speed in self.windows:
+            if start_time <= print_time < end_time:
+                break
+        else:
+            return False
+        value = self.read_load()
+        if value is None:
+            return False
+        self.readings.setdefault(speed, []).append(value)
+        threshold = self.get_threshold(speed)
+        return threshold is not None and value < threshold
+
+    def finish(self, jammed):
+        """
+        Stops watching move, readings from moves that did not jam are added to the learned baselines
+        """
+        if not jammed:
+            for speed, readings in self.readings.items():
+                samples = self.samples.setdefault(speed, [])
+                samples.append(AFCPathLength._median(readings))
+                del samples[:-LOAD_SAMPLES]
+        self.windows = []
+        self.readings = {}
+
+    def get_status(self):
+        response = {}
+        response['threshold'] = self.threshold or None
+        response['baselines'] = {str(speed): round(AFCPathLength._median(samples), 1)
+                                 for speed, samples in self.samples.items() if len(samples) >= LOAD_MIN_SAMPLES}
+        return response
+
+class AFCDriverState:
+    """
+    Applies current, enable and sync changes for a lane by calling its TMC driver, stepper_enable and extruder
+    stepper objects directly. Changes that would leave the driver in the state it is already in are skipped and
+    counted in `skips`, so repeated calls during tool changes do not dwell the toolhead or flush step generation.
+    """
+    def __init__(self, lane):
+        self.lane = lane
+        self.printer = lane.printer
+        self.current = None
+        self.pending_current = 0
+        self.current_helper = None
+        self.enable = None
+        self.skips = {'current': 0, 'enable': 0, 'sync': 0}
+
+    def get_current_helper(self):
+        """
+        Returns TMC current helper for lanes driver so current changes can be scheduled at a print time, None if
+        the driver does not expose one in which case current can only be set with SET_TMC_CURRENT
+        """
+        if self.current_helper is None:
+            tmc = self.printer.lookup_object(self.lane.tmc_name, None)
+            self.current_helper = getattr(tmc, 'current_helper', None)
+        return self.current_helper
+
+    def _is_current_set(self, current, current_helper):
+        if current != self.current:
+            return False
+        # Current could have been changed with SET_TMC_CURRENT since it was last set here
+        return self.pending_current or current_helper is None or current_helper.get_current()[0] == current
+
+    def _apply_current(self, current_helper, current, hold_current, print_time):
+        self.pending_current -= 1
+        current_helper.set_current(current, hold_current, print_time)
+
+    def set_current(self, current, print_time=None):
+        """
+        Sets TMC run current, capped at the drivers max current
+
+        :param current: Run current to set
+        :param print_time: Print time to set current at, defaults to toolheads print time
+        :return bool: True if current was changed, False if it was already set
+        """
+        current_helper = self.get_current_helper()
+        if current_helper is None:
+            if print_time is not None:
+                raise self.lane.gcode.error("{} does not expose current_helper, current cannot be set at a lane print time".format(
+                    self.lane.tmc_name))
+            if self._is_current_set(current, None):
+                self.skips['current'] += 1
+                return False
+            self.lane.gcode.run_script_from_command("SET_TMC_CURRENT STEPPER='{}' CURRENT={}".format(self.lane.name, current))
+            self.current = current
+            return True
+
+        hold_current, max_current = current_helper.get_current()[2:4]
+        current = min(current, max_current)
+        if self._is_current_set(current, current_helper):
+            self.skips['current'] += 1
+            return False
+        self.current = current
+        self.pending_current += 1
+        if print_time is None:
+            self.lane.toolhead.register_lookahead_callback(
+                lambda print_time: self._apply_current(current_helper, current, hold_current, print_time))
+        else:
+            self._apply_current(current_helper, current, hold_current, print_time)
+        return True
+
+    def set_enable(self, enable, print_time=None):
+        """
+        Enables or disables lane stepper at the lanes print time
+
+        :param print_time: Print time to change stepper state at, when set the toolhead is not waited on
+        :return bool: True if stepper state was changed, False if it was already in that state
+        """
+        if self.enable is None:
+            stepper_enable = self.printer.lookup_object('stepper_enable')
+            self.enable = stepper_enable.lookup_enable('AFC_stepper ' + self.lane.name)
+        if self.enable.is_motor_enabled() == bool(enable):
+            self.skips['enable'] += 1
+            return False
+        if print_time is not None:
+            if enable:
+                self.enable.motor_enable(print_time)
+            else:
+                self.enable.motor_disable(print_time)
+            return True
+        self.lane.sync_print_time()
+        if enable:
+            self.enable.motor_enable(self.lane.next_cmd_time)
+        else:
+            self.enable.motor_disable(self.lane.next_cmd_time)
+        self.lane.sync_print_time()
+        return True
+
+    def set_sync(self, extruder_name):
+        """
+        Syncs lane stepper to `extruder_name`, or unsyncs it when None
+
+        :return bool: True if lane was synced or unsynced, False if it already was
+        """
+        extruder_stepper = self.lane.extruder_stepper
+        if extruder_stepper.motion_queue == extruder_name:
+            self.skips['sync'] += 1
+            return False
+        self.lane.check_lane_motion("sync")
+        extruder_stepper.sync_to_extruder(extruder_name)
+        if extruder_name is None:
+            # Extruder moves can still be queued, lane moves must not start before they finish
+            self.lane.next_cmd_time = max(self.lane.next_cmd_time, self.lane.toolhead.get_last_move_time())
+        return True
+
+class AFCLaneEndstop:
+    """
+    Wraps a sensors MCU endstop for a lane homing move and records when it triggered. HomingMove only reports
+    where the stepper stopped, which cannot tell a trigger apart from a move that ran its full distance.
+    """
+    def __init__(self, mcu_endstop):
+        self.mcu_endstop = mcu_endstop
+        self.trigger_time = 0.
+
+    def __getattr__(self, name):
+        return getattr(self.mcu_endstop, name)
+
+    def home_wait(self, home_end_time):
+        self.trigger_time = self.mcu_endstop.home_wait(home_end_time)
+        return self.trigger_time
+
+class AFCLaneMove:
+    """
+    Handle for a lane move queued with `AFCExtruderStepper.schedule_move`. Can be polled with `done` or
+    waited on with `wait`.
+    """
+    def __init__(self, lane, print_time, end_time, cruise_v, distance, speed, assist_active, segments=(), disable=False):
+        self.lane = lane
+        self.print_time = print_time
+        self.end_time = end_time
+        self.chunk_time = lane._calc_chunk_time(cruise_v)
+        self.distance = distance
+        self.speed = speed
+        self.assist_active = assist_active
+        self.segments = segments
+        self.disable = disable
+        self.boosted = False
+        self.started = False
+        self.generated = lane.reactor.completion()
+
+    def start(self):
+        """
+        Called once step generation reaches this move, plans espooler speed changes for the move if active and
+        raises lane current for long moves
+        """
+        self.started = True
+        self.boosted = self.lane._start_boost(self.distance, self.print_time)
+        if self.assist_active: self.lane._plan_assist(self.distance, self.segments)
+
+    def finish(self):
+        """
+        Called once all steps for this move have been generated, stops espooler and drops boost current at the
+        end of the move. Lane is disabled at the end of the move when requested and no other moves are queued
+        after it, a later move enables the stepper again once its steps are generated.
+        """
+        if self.assist_active:
+            self.lane._flush_assist(self.end_time)
+            self.lane.assist(0, print_time=self.end_time)
+        if self.boosted: self.lane._end_boost(self.end_time)
+        if self.disable and not self.lane.lane_moves:
+            self.lane.driver.set_enable(False, self.end_time)
+        self.generated.complete(True)
+
+    def done(self, eventtime=None):
+        """
+        Returns True once all steps for the move have been generated and the MCU has finished the move
+
+        :param eventtime: Reactor time to check at, defaults to current time
+        """
+        if not self.generated.test():
+            return False
+        if eventtime is None:
+            eventtime = self.lane.reactor.monotonic()
+        mcu = self.lane.extruder_stepper.stepper.get_mcu()
+        return mcu.estimated_print_time(eventtime) >= self.end_time
+
+    def wait(self):
+        """
+        Blocks until lane has finished the move, other reactor tasks keep running while waiting
+        """
+        reactor = self.lane.reactor
+        mcu = self.lane.extruder_stepper.stepper.get_mcu()
+        self.generated.wait()
+        while True:
+            eventtime = reactor.monotonic()
+            remaining = self.end_time - mcu.estimated_print_time(eventtime)
+            if remaining <= 0.:
+                return
+            reactor.pause(eventtime + remaining)
+
 class AFCExtruderStepper:
     def __init__(self, config):
         self.printer = config.get_printer()
@@ -57,6 +459,13 @@ class AFCExtruderStepper:
         self.gcode = self.printer.lookup_object('gcode')
         self.reactor = self.printer.get_reactor()
         self.extruder_stepper = extruder.ExtruderStepper(config)
+        # Toolhead registers stepper.generate_steps as a step generator at connect, routing it through the lane
+        # makes the lane the only owner of step generation for its stepper so flush times never move backwards
+        stepper = self.extruder_stepper.stepper
+        self._stepper_generate_steps = stepper.generate_steps
+        stepper.generate_steps = self._toolhead_generate_steps
+        self._flush_time = 0.
+        self._lane_motion_active = False
 
         self.unit_obj       = None
         self.hub_obj        = None
@@ -102,23 +511,39 @@ class AFCExtruderStepper:
         self.short_moves_speed 	= config.getfloat("short_moves_speed", None)            # Speed in mm/s to move filament when doing short moves. Setting value here overrides values set in unit(AFC_BoxTurtle/NightOwl/etc) section
         self.short_moves_accel	= config.getfloat("short_moves_accel", None)            # Acceleration in mm/s squared when doing short moves. Setting value here overrides values set in unit(AFC_BoxTurtle/NightOwl/etc) section
         self.short_move_dis 	= config.getfloat("short_move_dis", None)               # Move distance in mm for failsafe moves. Setting value here overrides values set in unit(AFC_BoxTurtle/NightOwl/etc) section
-        self.max_move_dis       = config.getfloat("max_move_dis", 999999)               # Maximum distance to move filament. AFC breaks filament moves over this number into multiple moves. Useful to lower this number if running into timer too close errors when doing long filament moves. Setting value here overrides values set in unit(AFC_BoxTurtle/NightOwl/etc) section
+        self.max_move_dis       = config.getfloat("max_move_dis", None)                 # Maximum distance of filament to generate steps for at once. AFC queues long moves as one continuous move and generates steps in chunks no longer than this. Useful to lower this number if running into timer too close errors when doing long filament moves. Setting value here overrides values set in unit(AFC_BoxTurtle/NightOwl/etc) section
 
         self.dist_hub           = config.getfloat('dist_hub', 60)                       # Bowden distance between Box Turtle extruder and hub
         self.park_dist          = config.getfloat('park_dist', 10)                      # Currently unused
 
         self.load_to_hub        = config.getboolean("load_to_hub", self.AFC.load_to_hub) # Fast loads filament to hub when inserted, set to False to disable. Setting here overrides global setting in AFC.cfg
+        self.auto_rotation_distance = config.getboolean("auto_rotation_distance", self.AFC.auto_rotation_distance) # Set to True to correct rotation distance from the distance measured between hub and toolhead sensors. Setting here overrides global setting in AFC.cfg
         self.enable_sensors_in_gui = config.getboolean("enable_sensors_in_gui", self.AFC.enable_sensors_in_gui) # Set to True to show prep and load sensors switches as filament sensors in mainsail/fluidd gui, overrides value set in AFC.cfg
         self.sensor_to_show     = config.get("sensor_to_show", None)                   # Set to prep to only show prep sensor, set to load to only show load sensor. Do not add if you want both prep and load sensors to show in web gui
 
         self.printer.register_event_handler("AFC_unit_{}:connect".format(self.unit),self.handle_unit_connect)
 
         self.motion_queue = None
+        self.toolhead = None
+        # Buffer multiplier waiting to be applied, see `schedule_rotation_distance`
+        self._pending_multiplier = None
+        # Print time queued multiplier change is applied at, set by the toolhead lookahead callback
+        self._multiplier_time = None
         self.next_cmd_time = 0.
+        self.lane_moves = []
+        self.lane_motion_timer = None
+        self._lane_pos = 0.
+        self._gen_time = 0.
         ffi_main, ffi_lib = chelper.get_ffi()
         self.trapq = ffi_main.gc(ffi_lib.trapq_alloc(), ffi_lib.trapq_free)
         self.trapq_append = ffi_lib.trapq_append
         self.trapq_finalize_moves = ffi_lib.trapq_finalize_moves
+        self.trapq_extract_old = ffi_lib.trapq_extract_old
+        self._ffi_main = ffi_main
+        # Print time and state of the last edge seen on each sensor, see `note_sensor_edge`
+        self.sensor_edges = {}
+        # Completions waiting for a sensor to reach a state, see `espooler_rewind`
+        self._sensor_waits = {}
         self.stepper_kinematics = ffi_main.gc(
             ffi_lib.cartesian_stepper_alloc(b'x'), ffi_lib.free)
         self.assist_activate=False
@@ -135,6 +560,21 @@ class AFCExtruderStepper:
             buttons.register_buttons([self.load], self.load_callback)
         else: self.load_state = True
 
+        # Endstops for moves that stop on a sensor, these need to be created during config so the MCU can setup trsync for them
+        self.endstops = {}
+        self._homing_moves = []
+        self._homing_assist = False
+        self._homing_abort = None
+        # Planned (print_time, value) espooler speed changes, sent as steps for the move are generated
+        self._assist_points = []
+        # Set once lane has been moved to just before the hub by `stage_to_hub`
+        self.staged = False
+        # Sensor states that mean filament ran out or broke while lane is feeding filament
+        self.runout_abort = {'prep': False, 'load': False}
+        # Learned distances for paths between sensors, see `learn_path_length`
+        self.path_lengths = {}
+        self._setup_endstops(config)
+
         # Respoolers
         self.afc_motor_rwd = config.get('afc_motor_rwd', None)                                      # Reverse pin on MCU for spoolers
         self.afc_motor_fwd = config.get('afc_motor_fwd', None)                                      # Forwards pin on MCU for spoolers
@@ -145,9 +585,20 @@ class AFCExtruderStepper:
             self.afc_motor_fwd = AFC_assist.AFCassistMotor(config, 'fwd')
         if self.afc_motor_enb is not None:
             self.afc_motor_enb = AFC_assist.AFCassistMotor(config, 'enb')
+        self.espooler_eject = config.getboolean("espooler_eject", False)                           # Set to True to eject lane by releasing lane stepper and rewinding with espooler at full speed until load sensor clears. Only used when afc_motor_rwd is set
+        self.espooler_eject_timeout = config.getfloat("espooler_eject_timeout", 30., above=0.)      # Time in seconds espooler eject waits for load sensor to clear before falling back to ejecting with lane stepper
 
         self.tmc_print_current = config.getfloat("print_current", self.AFC.global_print_current)    # Current to use while printing, set to a lower current to reduce stepper heat when printing. Defaults to global_print_current, if not specified current is not changed.
+        self.boost_current = config.getfloat("boost_current", None, above=0.)                       # Current to use for lane moves of 200mm or more so long bowden moves can run at higher speeds, capped at the drivers max current. Current goes back to run_current when the move ends and is never used while synced. Needs a TMC driver that exposes current_helper. Leave unset to disable
         self._get_tmc_values( config )
+        # Last applied current, enable and sync state of lane driver, see `AFCDriverState`
+        self.driver = AFCDriverState(self)
+        self.jam_detection = config.getboolean("jam_detection", False)                             # Set to True to stop lane moves once TMC StallGuard shows the lane is jammed. Driver must support StallGuard and TCOOLTHRS must be set low enough for lane move speeds
+        self.jam_load_ratio = config.getfloat("jam_load_ratio", 0.5, above=0., below=1.)            # Fraction of the StallGuard value learned from good moves below which a move is treated as jammed
+        self.jam_threshold = config.getfloat("jam_threshold", 0., minval=0.)                         # Fixed StallGuard value below which a move is treated as jammed, leave at 0 to learn threshold from lane moves
+        self.driver_load = AFCDriverLoad(self._read_driver_load, self.jam_load_ratio, self.jam_threshold)
+        # Set when last lane homing move was stopped because driver load showed a jam
+        self.jam_detected = False
 
         self.filament_diameter = config.getfloat("filament_diameter", 1.75)                         # Diameter of filament being used
         self.filament_density = config.getfloat("filament_density", 1.24)                           # Density of filament being used
@@ -158,6 +609,8 @@ class AFCExtruderStepper:
         self.max_motor_rpm = config.getfloat("assist_max_motor_rpm", 500)                           # Max motor RPM
         self.rwd_speed_multi = config.getfloat("rwd_speed_multiplier", 0.5)                         # Multiplier to apply to rpm
         self.fwd_speed_multi = config.getfloat("fwd_speed_multiplier", 0.5)                         # Multiplier to apply to rpm
+        self.spool_inertia_accel = config.getboolean("spool_inertia_accel", self.AFC.spool_inertia_accel) # Set to True to scale lane move acceleration with estimated spool inertia. Setting here overrides global setting in AFC.cfg
+        self.max_accel_multiplier = config.getfloat("spool_accel_max_multiplier", 3., minval=1.)    # Largest multiple of configured acceleration used for light or nearly empty spools when spool_inertia_accel is enabled
         self.diameter_range = self.outer_diameter - self.inner_diameter  # Range for effective diameter
 
         # Set hub loading speed depending on distance between extruder and hub
@@ -169,6 +622,7 @@ class AFCExtruderStepper:
 
         # Get and save base rotation dist
         self.base_rotation_dist = self.extruder_stepper.stepper.get_rotation_distance()[0]
+        self.config_rotation_dist = self.base_rotation_dist
 
         if self.enable_sensors_in_gui:
             if self.sensor_to_show is None or self.sensor_to_show == 'prep':
@@ -193,6 +647,7 @@ class AFCExtruderStepper:
         """
         # Saving reference to unit
         self.unit_obj = unit_obj
+        self.toolhead = self.printer.lookup_object('toolhead')
         self.buffer_obj = self.unit_obj.buffer_obj
 
         # Registering lane name in unit
@@ -285,11 +740,74 @@ class AFCExtruderStepper:
         if self.short_move_dis is None: self.short_move_dis = self.unit_obj.short_move_dis
         if self.max_move_dis is None: self.max_move_dis = self.unit_obj.max_move_dis
 
+        # Boost current is changed at lane print times, SET_TMC_CURRENT can only change it at the toolheads print time
+        if self.boost_current is not None and self.driver.get_current_helper() is None:
+            error_string = 'Error: boost_current in [AFC_stepper {name}] needs [{tmc}] to expose current_helper. Please remove boost_current from your config'.format(
+                name=self.name, tmc=self.tmc_name)
+            raise error(error_string)
+
         # Send out event so that macros and be registered properly with valid lane names
         self.printer.send_event("afc_stepper:register_macros", self)
 
         self.connect_done = True
 
+    def _setup_endstops(self, config):
+        """
+        Creates endstops on the prep, load, hub and toolhead sensor pins for this lane so lane moves can be stopped
+        by the MCU once a sensor changes state. Hub and extruder configs are looked up directly since their objects
+        are not assigned to lane until klippy:connect, which is too late to create endstops.
+        """
+        stepper = self.extruder_stepper.stepper
+        if self.prep is not None:
+            self.endstops['prep'] = add_endstop(self.prep, stepper, self.printer)
+        if self.load is not None:
+            self.endstops['load'] = add_endstop(self.load, stepper, self.printer)
+
+        sections = config.fileconfig.sections()
+        non_unit_sections = ['AFC_stepper', 'AFC_hub', 'AFC_extruder', 'AFC_buffer', 'AFC_led']
+        unit_config = next((config.getsection(s) for s in sections if s.startswith('AFC_') and len(s.split()) == 2
+                            and s.split()[0] not in non_unit_sections and s.split()[-1] == self.unit), None)
+
+        hub = self.hub
+        if hub is None and unit_config is not None:
+            hub = unit_config.get('hub', None)
+        if hub is None:
+            hub = next((s.split()[-1] for s in sections if s.startswith('AFC_hub ')), None)
+        if hub is not None and hub != 'direct' and config.has_section('AFC_hub {}'.format(hub)):
+            switch_pin = config.getsection('AFC_hub {}'.format(hub)).get('switch_pin', None)
+            if switch_pin is not None:
+                self.endstops['hub'] = add_endstop(switch_pin, stepper, self.printer)
+
+        extruder = self.extruder_name
+        if extruder is None and unit_config is not None:
+            extruder = unit_config.get('extruder', None)
+        extruder_config = None
+        if extruder is not None and config.has_section('AFC_extruder {}'.format(extruder)):
+            extruder_config = config.getsection('AFC_extruder {}'.format(extruder))
+            tool_start = extruder_config.get('pin_tool_start', None)
+            tool_end = extruder_config.get('pin_tool_end', None)
+            # Ramming with buffer uses buffer advance pin as toolhead sensor, added below
+            if tool_start is not None and tool_start != 'buffer':
+                self.endstops['tool_start'] = add_endstop(tool_start, stepper, self.printer)
+            if tool_end is not None:
+                self.endstops['tool_end'] = add_endstop(tool_end, stepper, self.printer)
+
+        # Buffer is looked up in the same order as `handle_connect`, stepper then unit then extruder
+        buffer = self.buffer_name
+        if buffer is None and unit_config is not None:
+            buffer = unit_config.get('buffer', None)
+        if buffer is None and extruder_config is not None:
+            buffer = extruder_config.get('buffer', None)
+        if buffer is not None and config.has_section('AFC_buffer {}'.format(buffer)):
+            buffer_config = config.getsection('AFC_buffer {}'.format(buffer))
+            advance_pin = buffer_config.get('advance_pin', None)
+            trailing_pin = buffer_config.get('trailing_pin', None)
+            if advance_pin is not None and trailing_pin is not None:
+                self.endstops['buffer_advance'] = add_endstop(advance_pin, stepper, self.printer)
+                self.endstops['buffer_trailing'] = add_endstop(trailing_pin, stepper, self.printer)
+                if extruder_config is not None and extruder_config.get('pin_tool_start', None) == 'buffer':
+                    self.endstops['tool_start'] = self.endstops['buffer_advance']
+
     def _get_tmc_values(self, config):
         """
         Searches for TMC driver that corresponds to stepper to get run current that is specified in config
@@ -300,8 +818,42 @@ class AFCExtruderStepper:
             raise self.gcode.error("Count not find TMC for stepper {}".format(self.name))
 
         self.tmc_load_current = self.tmc_driver.getfloat('run_current')
+        self.tmc_name = self.tmc_driver.get_name()
 
-    def assist(self, value, is_resend=False):
+    def _read_driver_load(self):
+        """
+        Reads StallGuard result from lanes TMC driver, returns None if driver does not support StallGuard or
+        the read failed
+        """
+        tmc = self.printer.lookup_object(self.tmc_name, None)
+        fields = getattr(tmc, 'fields', None)
+        if fields is None:
+            return None
+        reg_name = fields.lookup_register('sg_result', None)
+        if reg_name is None:
+            return None
+        try:
+            return fields.get_field('sg_result', tmc.mcu_tmc.get_register(reg_name))
+        except self.printer.command_error:
+            return None
+
+    def _set_assist_pin(self, motor, value, print_time=None):
+        """
+        Sets espooler pin at the given print time, or at the toolheads print time when print_time is not specified
+        """
+        if print_time is None:
+            self.toolhead.register_lookahead_callback(lambda print_time: motor._set_pin(print_time, value))
+        else:
+            motor._set_pin(print_time, value)
+
+    def assist(self, value, is_resend=False, print_time=None):
+        """
+        Sets espooler speed, positive values assist forward and negative values rewind
+
+        :param value: Espooler speed between -1 and 1
+        :param print_time: Print time to set espooler at, defaults to toolheads print time. Used when lane moves
+                           are scheduled on lanes own timeline
+        """
         if self.afc_motor_rwd is None:
             return
         if value < 0:
@@ -313,86 +865,801 @@ class AFCExtruderStepper:
             else:
                 assit_motor=self.afc_motor_fwd
         elif value == 0:
-            toolhead = self.printer.lookup_object('toolhead')
-            toolhead.register_lookahead_callback(lambda print_time: self.afc_motor_rwd._set_pin(print_time, value))
+            self._set_assist_pin(self.afc_motor_rwd, value, print_time)
             if self.afc_motor_fwd is not None:
-                toolhead.register_lookahead_callback(lambda print_time: self.afc_motor_fwd._set_pin(print_time, value))
+                self._set_assist_pin(self.afc_motor_fwd, value, print_time)
             return
         value /= assit_motor.scale
         if not assit_motor.is_pwm and value not in [0., 1.]:
             if value > 0:
                 value = 1
         # Obtain print_time and apply requested settings
-        toolhead = self.printer.lookup_object('toolhead')
         if self.afc_motor_enb is not None:
             if value != 0:
                 enable = 1
             else:
                 enable = 0
-            toolhead.register_lookahead_callback(
-            lambda print_time: self.afc_motor_enb._set_pin(print_time, enable))
-        toolhead.register_lookahead_callback(
-            lambda print_time: assit_motor._set_pin(print_time, value))
+            self._set_assist_pin(self.afc_motor_enb, enable, print_time)
+        self._set_assist_pin(assit_motor, value, print_time)
+
+    def _calc_chunk_time(self, cruise_v):
+        """
+        Calculates how far ahead in time steps are generated for a lane move. Chunks are limited by the
+        MCU queue lead time, by the number of steps the stepper produces at cruise speed and by
+        max_move_dis when a user has lowered it.
+
+        :param cruise_v: Cruise velocity of the move in mm/s
+        :return float: Chunk duration in seconds
+        """
+        step_dist = self.extruder_stepper.stepper.get_step_dist()
+        chunk_time = min(MOVE_LEAD_TIME, MAX_CHUNK_STEPS * step_dist / cruise_v)
+        if self.max_move_dis:
+            chunk_time = min(chunk_time, self.max_move_dis / cruise_v)
+        return chunk_time
+
+    def _plan_assist(self, distance, segments):
+        """
+        Plans espooler speed changes that follow the accel, cruise and decel phases of a lane move so the spool
+        speeds up and slows down with the filament. Speed is updated every ASSIST_PROFILE_TIME while the lane
+        accelerates or decelerates and is calculated from the current spool diameter. Changes are sent with
+        `_flush_assist` as steps for the move are generated.
+
+        :param distance: Distance in mm lane is moving, negative values rewind the spool
+        :param segments: List of (print_time, accel_t, cruise_t, decel_t, start_v, cruise_v, accel) tuples for the move
+        """
+        self.update_remaining_weight(distance)
+        rewind = distance < 0
+        velocities = []
+        for print_time, accel_t, cruise_t, decel_t, start_v, cruise_v, accel in segments:
+            # Use average velocity over each interval so spool speed does not lag behind the filament
+            t = 0.
+            while t < accel_t:
+                velocities.append((print_time + t, start_v + accel * min(t + ASSIST_PROFILE_TIME / 2., accel_t)))
+                t += ASSIST_PROFILE_TIME
+            if cruise_t > 0.:
+                velocities.append((print_time + accel_t, cruise_v))
+            decel_time = print_time + accel_t + cruise_t
+            t = 0.
+            while t < decel_t:
+                velocities.append((decel_time + t, cruise_v - accel * min(t + ASSIST_PROFILE_TIME / 2., decel_t)))
+                t += ASSIST_PROFILE_TIME
+
+        for print_time, velocity in velocities:
+            value = min(self.calculate_pwm_value(velocity, rewind), 1.)
+            self._assist_points.append((print_time, value * -1 if rewind else value))
+
+    def _flush_assist(self, print_time):
+        """
+        Sends planned espooler speed changes up to `print_time` to the mcu
+        """
+        while self._assist_points and self._assist_points[0][0] <= print_time:
+            point_time, value = self._assist_points.pop(0)
+            self.assist(value, print_time=point_time)
+
+    def _generate_steps(self, flush_time):
+        """
+        Generates steps for lane stepper up to `flush_time`. Itersolve always continues from the last flush time
+        it was given, so flushes to an earlier time than the last one are skipped instead of generating steps again.
+        """
+        if flush_time <= self._flush_time:
+            return
+        self._flush_time = flush_time
+        self._stepper_generate_steps(flush_time)
+
+    def _toolhead_generate_steps(self, flush_time):
+        """
+        Step generator the toolhead flushes lane stepper through. While lane motion has the stepper swapped onto
+        the lanes trapq the lane generates its own steps, toolhead flushes are skipped so they cannot run ahead
+        of a homing move or interleave with lane chunks.
+        """
+        if self._lane_motion_active:
+            return
+        if self._multiplier_time is not None and flush_time >= self._multiplier_time:
+            # Steps up to the queued multiplier change keep the old step distance, toolhead is already flushing
+            # past that time so this does not generate ahead of it
+            self._generate_steps(self._multiplier_time)
+            self._set_rotation_distance(self._pending_multiplier)
+        self._generate_steps(flush_time)
+
+    def _start_lane_motion(self):
+        """
+        Swaps lane stepper over to the lanes own trapq and kinematics so the lane can be moved
+        independently of the extruder it may be synced to. Lane moves must not start before `_flush_time`,
+        steps before it can no longer be generated.
+        """
+        stepper = self.extruder_stepper.stepper
+        # Only need to flush toolhead when lane is synced, flushing ends toolhead lookahead which would stall
+        #  toolhead moves that are running at the same time as lane moves
+        if stepper.get_trapq() is not None:
+            self.toolhead.flush_step_generation()
+        self._lane_motion_active = True
+        self._prev_sk = stepper.set_stepper_kinematics(self.stepper_kinematics)
+        self._prev_trapq = stepper.set_trapq(self.trapq)
+        stepper.set_position((0., 0., 0.))
+
+    def _end_lane_motion(self, end_time, clear_history=False):
+        """
+        Finalizes lane moves queued since `_start_lane_motion` and gives stepper back to its previous trapq
+        and kinematics. Moves are kept in trapq history for MOVE_HISTORY_EXPIRE so sensor edges can be
+        mapped to lane positions with `get_lane_travel`.
+
+        :param end_time: Print time of when the last queued lane move ends
+        :param clear_history: Set to True to drop all history, used when queued moves were cut short
+        """
+        stepper = self.extruder_stepper.stepper
+        clear_time = end_time + 99999.9 if clear_history else end_time - MOVE_HISTORY_EXPIRE
+        self.trapq_finalize_moves(self.trapq, end_time + 99999.9, clear_time)
+        stepper.set_trapq(self._prev_trapq)
+        stepper.set_stepper_kinematics(self._prev_sk)
+        self._lane_motion_active = False
+
+    def _append_lane_moves(self, print_time, start_pos, moves, scale_accel=True):
+        """
+        Appends a chain of moves to the lanes trapq, moves are joined with junction velocities from
+        `calc_junction_moves` so the lane does not stop between them.
+
+        :param print_time: Print time the first move starts at
+        :param start_pos: Lane position in mm at the start of the first move
+        :param moves: List of (distance, speed, accel) tuples
+        :param scale_accel: Set to False to keep accelerations as given instead of scaling them with spool inertia
+        :return tuple: Print time of when the last move ends, highest cruise speed of the moves, list of
+                       (print_time, accel_t, cruise_t, decel_t, start_v, cruise_v, accel) tuples for each move
+        """
+        accel_scale = self.get_spool_accel_scale() if scale_accel else 1.
+        if accel_scale != 1.:
+            moves = [(distance, speed, accel * accel_scale) for distance, speed, accel in moves]
+        max_cruise_v = 0.
+        segments = []
+        for axis_r, accel_t, cruise_t, decel_t, start_v, cruise_v, accel in calc_junction_moves(moves):
+            self.trapq_append(self.trapq, print_time, accel_t, cruise_t, decel_t,
+                              start_pos, 0., 0., axis_r, 0., 0., start_v, cruise_v, accel)
+            segments.append((print_time, accel_t, cruise_t, decel_t, start_v, cruise_v, accel))
+            start_pos += axis_r * ((start_v + cruise_v) * accel_t / 2. + cruise_v * cruise_t
+                                   + (cruise_v + cruise_v - accel * decel_t) * decel_t / 2.)
+            print_time += accel_t + cruise_t + decel_t
+            max_cruise_v = max(max_cruise_v, cruise_v)
+        return print_time, max_cruise_v, segments
+
+    def _queue_lane_moves(self, print_time, start_pos, moves, drip_completion=None, assist_active=False, abort_on=None):
+        """
+        Queues a chain of moves on the lanes trapq and generates their steps. The moves are queued as one velocity
+        profile and steps are generated in chunks so long moves do not fill the MCU queue too far ahead.
+
+        :param print_time: Print time the first move starts at
+        :param start_pos: Lane position in mm at the start of the first move
+        :param moves: List of (distance, speed, accel) tuples
+        :param drip_completion: Completion that stops step generation once it is done, used for homing moves
+        :param assist_active: Set to True to run the espooler during the moves
+        :param abort_on: Dictionary of sensor names and states that stop step generation, see `runout_abort`
+        :return float: Print time of when the last move ends, or of the last generated step if lane jammed or
+                       a sensor in `abort_on` reached its abort state
+        """
+        toolhead = self.toolhead
+        stepper = self.extruder_stepper.stepper
+        end_time, cruise_v, segments = self._append_lane_moves(print_time, start_pos, moves)
+        if assist_active: self._plan_assist(sum(move[0] for move in moves), segments)
+        watch_load = self.jam_detection and drip_completion is not None
+        if watch_load: self.driver_load.start(segments)
+
+        # Generate steps a chunk at a time, waiting for the mcu to catch up so the
+        #  queue never holds more than MOVE_LEAD_TIME worth of steps
+        chunk_time = self._calc_chunk_time(cruise_v)
+        mcu = stepper.get_mcu()
+        gen_time = print_time
+        aborted = False
+        while gen_time < end_time:
+            if drip_completion is not None and drip_completion.test():
+                break
+            gen_time = min(gen_time + chunk_time, end_time)
+            self._generate_steps(gen_time)
+            toolhead.note_mcu_movequeue_activity(gen_time)
+            self._flush_assist(gen_time)
+            if gen_time < end_time:
+                curtime = self.reactor.monotonic()
+                wait_time = gen_time - MOVE_LEAD_TIME - mcu.estimated_print_time(curtime)
+                if wait_time > 0.:
+                    if drip_completion is not None:
+                        drip_completion.wait(curtime + wait_time)
+                    else:
+                        self.reactor.pause(curtime + wait_time)
+                # Stop generating steps once lane jams, steps already queued run out within MOVE_LEAD_TIME
+                if watch_load and self.driver_load.check(mcu.estimated_print_time(self.reactor.monotonic())):
+                    self.jam_detected = True
+                    break
+                # Abort sensors are checked on the host, the MCU only allows a stepper on one endstop at a time
+                if self.get_abort_sensor(abort_on) is not None:
+                    aborted = True
+                    break
+        if watch_load: self.driver_load.finish(self.jam_detected)
+        # Espooler changes planned past where a homing move stopped are dropped
+        self._assist_points = []
+        if self.jam_detected or aborted:
+            # Lane stops once generated steps run out, homing move should not wait for the planned end
+            return gen_time
+        return end_time
+
+    def schedule_move(self, distance, speed, accel, assist_active=False, print_time=None, disable=False, scale_accel=True):
+        """
+        Queues a lane move on the lanes own timeline and returns without waiting for it to finish. Steps are
+        generated in the background so the toolhead and other lanes are free to move while this lane is moving.
+        Moves scheduled back to back on a lane run one after another. Lane must not be synced to an extruder
+        while it has moves pending, `sync_to_extruder` waits for pending moves to finish.
+
+        :param distance: Distance in mm to move lane, negative values retract
+        :param speed: Speed of the move in mm/s
+        :param accel: Acceleration of the move in mm/s^2
+        :param assist_active: Set to True to run the espooler during the move
+        :param print_time: Earliest print time the move can start at, defaults to as soon as possible
+        :param disable: Set to True to disable lane stepper once the move is done
+        :param scale_accel: Set to False to keep `accel` as given instead of scaling it with spool inertia, used for
+                            moves that have to match an extruder move
+        :return AFCLaneMove: Handle that can be polled or waited on for move to finish
+        """
+        return self.schedule_moves([(distance, speed, accel)], assist_active, print_time, disable, scale_accel)
+
+    def schedule_moves(self, moves, assist_active=False, print_time=None, disable=False, scale_accel=True):
+        """
+        Same as `schedule_move` but queues a chain of moves with different speed limits, consecutive moves in the
+        same direction are joined with junction velocities so the lane does not stop between them.
+
+        :param moves: List of (distance, speed, accel) tuples
+        :param assist_active: Set to True to run the espooler during the moves
+        :param print_time: Earliest print time the moves can start at, defaults to as soon as possible
+        :param disable: Set to True to disable lane stepper once the moves are done
+        :param scale_accel: Set to False to keep accelerations as given instead of scaling them with spool inertia
+        :return AFCLaneMove: Handle that can be polled or waited on for the moves to finish
+        """
+        mcu = self.extruder_stepper.stepper.get_mcu()
+        if not self.lane_moves:
+            self._start_lane_motion()
+            self._lane_pos = 0.
+        start_time = max(self.next_cmd_time, self._flush_time,
+                         mcu.estimated_print_time(self.reactor.monotonic()) + LANE_MOVE_START_DELAY)
+        if print_time is not None:
+            start_time = max(start_time, print_time)
+
+        end_time, cruise_v, segments = self._append_lane_moves(start_time, self._lane_pos, moves, scale_accel)
+        distance = sum(move[0] for move in moves)
+        self._lane_pos += distance
+        self.next_cmd_time = end_time
+
+        lane_move = AFCLaneMove(self, start_time, end_time, cruise_v, distance, cruise_v, assist_active, segments, disable)
+        self.lane_moves.append(lane_move)
+        if self.lane_motion_timer is None:
+            self._gen_time = start_time
+            self.lane_motion_timer = self.reactor.register_timer(self._lane_motion_event, self.reactor.NOW)
+        return lane_move
+
+    def _lane_motion_event(self, eventtime):
+        """
+        Reactor timer that generates steps for scheduled lane moves a chunk at a time so the MCU queue never
+        holds more than MOVE_LEAD_TIME worth of steps. Gives stepper back once all scheduled moves are generated.
+        """
+        stepper = self.extruder_stepper.stepper
+        toolhead = self.toolhead
+        gen_limit = stepper.get_mcu().estimated_print_time(eventtime) + MOVE_LEAD_TIME
+        while self.lane_moves and self._gen_time < gen_limit:
+            lane_move = self.lane_moves[0]
+            if not lane_move.started:
+                lane_move.start()
+            gen_time = min(self._gen_time + lane_move.chunk_time, lane_move.end_time, gen_limit)
+            self._generate_steps(gen_time)
+            toolhead.note_mcu_movequeue_activity(gen_time)
+            self._flush_assist(gen_time)
+            self._gen_time = gen_time
+            if gen_time >= lane_move.end_time:
+                self.lane_moves.pop(0)
+                lane_move.finish()
+
+        if self.lane_moves:
+            return eventtime + MOVE_LEAD_TIME / 2.
+
+        self._end_lane_motion(self._gen_time)
+        self.reactor.unregister_timer(self.lane_motion_timer)
+        self.lane_motion_timer = None
+        return self.reactor.NEVER
+
+    def wait_lane_moves(self):
+        """
+        Blocks until all moves scheduled on this lane have finished
+        """
+        if self.lane_moves:
+            self.lane_moves[-1].wait()
+
+    def move_with_extruder(self, distance, speed):
+        """
+        Moves extruder `distance` and runs a matching lane move starting at the same print time while lane
+        stays unsynced. Used for single extruder moves where syncing lane would flush step generation and change
+        TMC current, small differences in acceleration are taken up by the buffer.
+
+        :param distance: Distance in mm to move extruder and lane, negative values retract
+        :param speed: Speed of the move in mm/s
+        """
+        toolhead = self.toolhead
+        self.wait_lane_moves()
+        # Lane follows the extruder move, so its acceleration is not raised for light spools
+        lane_move = self.schedule_move(distance, speed, self.short_moves_accel, print_time=toolhead.get_last_move_time(),
+                                       scale_accel=False)
+        pos = toolhead.get_position()
+        pos[3] += distance
+        toolhead.manual_move(pos, speed)
+        toolhead.wait_moves()
+        lane_move.wait()
 
     def _move(self, distance, speed, accel, assist_active=False):
         """
         Move the specified lane a given distance with specified speed and acceleration.
-        This function calculates the movement parameters and commands the stepper motor
-        to move the lane accordingly.
+        This function schedules the move after any queued toolhead moves and waits for
+        the lane to finish the move.
         Parameters:
         distance (float): The distance to move.
         speed (float): The speed of the movement.
         accel (float): The acceleration of the movement.
         """
+        toolhead = self.toolhead
+        lane_move = self.schedule_move(distance, speed, accel, assist_active, toolhead.get_last_move_time())
+        lane_move.wait()
 
-        if assist_active:
-            self.update_remaining_weight(distance)
-            if distance < 0:
-                # Calculate Rewind Speed
-                value = self.calculate_pwm_value(speed, True) * -1
-            else:
-                # Calculate Forward Assist Speed
-                value = self.calculate_pwm_value(speed)
+    def move(self, distance, speed, accel, assist_active=False):
+        """
+        Moves lane the full distance as a single move and waits for it to finish, see `schedule_move`
+        to queue a lane move without waiting.
 
-            # Clamp value to a maximum of 1
-            if value > 1:
-                value = 1
-            self.assist(value)  # Activate assist motor with calculated value
-
-        toolhead = self.printer.lookup_object('toolhead')
-        toolhead.flush_step_generation()
-        prev_sk = self.extruder_stepper.stepper.set_stepper_kinematics(self.stepper_kinematics)
-        prev_trapq = self.extruder_stepper.stepper.set_trapq(self.trapq)
-        self.extruder_stepper.stepper.set_position((0., 0., 0.))
-        axis_r, accel_t, cruise_t, cruise_v = calc_move_time(distance, speed, accel)
-        print_time = toolhead.get_last_move_time()
-        self.trapq_append(self.trapq, print_time, accel_t, cruise_t, accel_t,
-                          0., 0., 0., axis_r, 0., 0., 0., cruise_v, accel)
-        print_time = print_time + accel_t + cruise_t + accel_t
-        self.extruder_stepper.stepper.generate_steps(print_time)
-        self.trapq_finalize_moves(self.trapq, print_time + 99999.9,
-                                  print_time + 99999.9)
-        self.extruder_stepper.stepper.set_trapq(prev_trapq)
-        self.extruder_stepper.stepper.set_stepper_kinematics(prev_sk)
-        toolhead.note_mcu_movequeue_activity(print_time)
-        toolhead.dwell(accel_t + cruise_t + accel_t)
-        toolhead.flush_step_generation()
-        toolhead.wait_moves()
-        if assist_active: self.assist(0)
+        :param distance: Distance in mm to move lane, negative values retract
+        :param speed: Speed of the move in mm/s
+        :param accel: Acceleration of the move in mm/s^2
+        :param assist_active: Set to True to run the espooler during the move
+        """
+        self._move(distance, speed, accel, assist_active)
 
-    def move(self, distance, speed, accel, assist_active=False):
+    def get_sensor_state(self, sensor):
+        """
+        Helper function that returns current state of a sensor along the lanes filament path
+
+        :param sensor: Name of sensor, one of prep, load, hub, tool_start, tool_end, buffer_advance or buffer_trailing
+        :return bool: True if sensor detects filament
+        """
+        if sensor == 'prep':
+            return bool(self.prep_state)
+        elif sensor == 'load':
+            return bool(self.load_state)
+        elif sensor == 'hub':
+            return bool(self.hub_obj.state)
+        elif sensor == 'tool_start':
+            return bool(self.get_toolhead_sensor_state())
+        elif sensor == 'tool_end':
+            return bool(self.extruder_obj.tool_end_state)
+        elif sensor == 'buffer_advance':
+            return bool(self.buffer_obj.advance_state)
+        elif sensor == 'buffer_trailing':
+            return bool(self.buffer_obj.trailing_state)
+        raise self.gcode.error("Unknown sensor {} for lane {}".format(sensor, self.name))
+
+    def _get_learned_path(self, path):
+        path_length = self.path_lengths.get(path)
+        if path_length is None or not path_length.is_learned():
+            return None
+        return path_length
+
+    def learn_path_length(self, path, distance):
+        """
+        Records distance lane moved along `path` before a sensor changed state
+
+        :param path: Name of path, one of hub, bowden or hub_clear
+        :param distance: Distance in mm lane moved
+        """
+        self.path_lengths.setdefault(path, AFCPathLength()).add(distance)
+        if path == 'bowden':
+            self.calibrate_rotation_distance()
+
+    def calibrate_rotation_distance(self):
+        """
+        Corrects rotation distance from the bowden length this lane measured between the hub and toolhead sensors.
+        All lanes going through the same hub to the same toolhead travel the same physical distance, so the median
+        of their learned bowden lengths is used as the reference and any difference is caused by this lanes
+        rotation distance. Corrections are limited to ROTATION_MAX_CORRECTION at a time.
+        """
+        if not self.auto_rotation_distance or self.hub == 'direct':
+            return
+        bowden = self._get_learned_path('bowden')
+        if bowden is None:
+            return
+        lengths = []
+        for lane in self.hub_obj.lanes.values():
+            if lane.extruder_obj is not self.extruder_obj:
+                continue
+            path_length = lane._get_learned_path('bowden')
+            if path_length is not None:
+                lengths.append(path_length.length())
+        if len(lengths) < ROTATION_MIN_LANES:
+            return
+
+        correction = AFCPathLength._median(lengths) / bowden.length() - 1.
+        if abs(correction) < ROTATION_MIN_CORRECTION:
+            return
+        correction = max(-ROTATION_MAX_CORRECTION, min(ROTATION_MAX_CORRECTION, correction))
+        prev_rotation_dist = self.base_rotation_dist
+        self.set_base_rotation_distance(self.base_rotation_dist * (1. + correction))
+        self.gcode.respond_info("{} rotation distance corrected from {:.4f} to {:.4f}".format(
+            self.name, prev_rotation_dist, self.base_rotation_dist))
+
+    def set_base_rotation_distance(self, rotation_dist):
+        """
+        Sets base rotation distance of lane, keeps any multiplier currently applied by the buffer and rescales
+        learned path lengths to the new rotation distance
+        """
+        stepper = self.extruder_stepper.stepper
+        factor = rotation_dist / self.base_rotation_dist
+        multiplier = self._pending_multiplier or self.base_rotation_dist / stepper.get_rotation_distance()[0]
+        self.base_rotation_dist = rotation_dist
+        self.update_rotation_distance(multiplier)
+        for path_length in self.path_lengths.values():
+            path_length.scale(factor)
+
+    def load_path_lengths(self, path_lengths):
+        """
+        Restores learned path lengths from the dictionary saved in the variables file
+        """
+        for path, values in path_lengths.items():
+            self.path_lengths[path] = AFCPathLength(values.get('samples'))
+
+    def get_path_length(self, path, default):
+        """
+        Returns learned length of `path` in mm, or `default` until enough distances have been recorded
+
+        :param path: Name of path, one of hub, bowden or hub_clear
+        :param default: Length from config to use when path has not been learned yet
+        """
+        path_length = self._get_learned_path(path)
+        if path_length is None:
+            return default
+        return math.copysign(path_length.length(), default)
+
+    def get_approach_margin(self, path=None):
+        """
+        Returns margin in mm before a sensor is expected to change state where lane slows down. Learned paths
+        use a margin based on how much the recorded distances vary, up to `approach_margin`.
+        """
+        path_length = self._get_learned_path(path)
+        if path_length is None:
+            return self.AFC.approach_margin
+        return min(self.AFC.approach_margin, max(path_length.spread() * PATH_MARGIN_SPREAD, PATH_MIN_MARGIN))
+
+    def get_trigger_bound(self, tolerance, path=None):
+        """
+        Returns distance in mm to look for a sensor after the approach moves. Learned paths look
+        PATH_LEARNED_RETRIES short_move_dis past the margin instead of the full `tolerance`.
+
+        :param tolerance: Distance in mm to look for sensor past the approach margin
+        :param path: Name of path the approach moves cover
+        """
+        if self._get_learned_path(path) is not None:
+            tolerance = min(tolerance, self.short_move_dis * PATH_LEARNED_RETRIES)
+        return self.get_approach_margin(path) + tolerance
+
+    def get_approach_moves(self, moves, path=None):
+        """
+        Shortens known moves leading up to a sensor so lane cruises at full speed until `approach_margin`
+        before the sensor is expected to change state. The remaining distance is left for the slower sensor
+        bounded move in `move_to_trigger`.
+
+        :param moves: List of (distance, speed, accel) tuples covering the known distance to the sensor
+        :param path: Name of path the moves cover, used to pick margin for learned paths
+        :return list: Approach moves to pass to `move_to_trigger`
+        """
+        approach_moves = list(moves)
+        margin = self.get_approach_margin(path)
+        while approach_moves and margin > 0:
+            distance, speed, accel = approach_moves.pop()
+            if abs(distance) > margin:
+                approach_moves.append((math.copysign(abs(distance) - margin, distance), speed, accel))
+                break
+            margin -= abs(distance)
+        return approach_moves
+
+    def move_to_trigger(self, sensor, distance, speed, accel, triggered=True, assist_active=False, approach_moves=None,
+                        path=None, abort_on=None):
+        """
+        Moves lane up to `distance` and stops as soon as `sensor` reaches the requested state. When an endstop
+        exists for the sensor the move is stopped by the MCU, otherwise lane is moved in short_move_dis
+        steps and the sensor is checked after each move.
+
+        Faster moves leading up to the sensor can be passed in `approach_moves`, these are joined with the
+        sensor move so the lane only slows down to `speed` instead of stopping before looking for the sensor.
+
+        :param sensor: Sensor to stop on, one of prep, load, hub, tool_start or tool_end
+        :param distance: Maximum distance in mm to move lane, negative values retract
+        :param speed: Speed of the move in mm/s
+        :param accel: Acceleration of the move in mm/s^2
+        :param triggered: Set to True to stop once sensor detects filament, False to stop once sensor is clear
+        :param assist_active: Set to True to run the espooler during the move
+        :param approach_moves: List of (distance, speed, accel) tuples to move before the sensor move
+        :param path: Name of path to record the distance moved for when sensor is reached, see `learn_path_length`
+        :param abort_on: Dictionary of sensor names and states that stop the move early as a failure, see `runout_abort`
+        :return tuple: True if sensor reached requested state, distance in mm lane moved
+        """
+        self.wait_lane_moves()
+        self.jam_detected = False
+        if self.get_abort_sensor(abort_on) is not None:
+            return False, 0.
+        if self.get_sensor_state(sensor) == triggered:
+            return True, 0.
+
+        moves = list(approach_moves or []) + [(distance, speed, accel)]
+        mcu_endstop = self.endstops.get(sensor)
+        if mcu_endstop is None:
+            return self._poll_to_trigger(sensor, moves, triggered, assist_active, abort_on, path)
+
+        endstop = AFCLaneEndstop(mcu_endstop)
+        moved = self._endstop_move(endstop, sensor, moves, triggered, assist_active, abort_on)
+        # Sensor is only reached when its own endstop stopped the move, moves stopped by a jam or an abort sensor
+        #  end short of the full distance as well
+        if endstop.trigger_time <= 0. or self.jam_detected or self.get_abort_sensor(abort_on) is not None:
+            return False, moved
+
+        # Only distances from MCU stopped moves are accurate enough to learn from
+        if path is not None:
+            self.learn_path_length(path, moved)
+        return True, moved
+
+    def move_with_abort(self, distance, speed, accel, assist_active=False, abort_on=None):
+        """
+        Moves lane `distance` and stops early once any sensor in `abort_on` reaches its abort state, so a
+        filament runout or break stops the move right away instead of after the full move. Sensors are checked
+        each time a chunk of steps is generated, so lane stops within MOVE_LEAD_TIME of the sensor changing.
+
+        :param distance: Distance in mm to move lane, negative values retract
+        :param speed: Speed of the move in mm/s
+        :param accel: Acceleration of the move in mm/s^2
+        :param assist_active: Set to True to run the espooler during the move
+        :param abort_on: Dictionary of sensor names and states that stop the move, defaults to `runout_abort`
+        :return tuple: True if move completed without an abort, distance in mm lane moved
+        """
+        if abort_on is None:
+            abort_on = self.runout_abort
+        self.wait_lane_moves()
+        self.jam_detected = False
+        if self.get_abort_sensor(abort_on) is not None:
+            return False, 0.
+
+        moved = self._endstop_move(None, None, [(distance, speed, accel)], True, assist_active, abort_on)
+        return not self.jam_detected and self.get_abort_sensor(abort_on) is None, moved
+
+    def espooler_rewind(self, sensor, triggered=False, timeout=None):
+        """
+        Releases lane stepper and rewinds spool with espooler at full speed until `sensor` reaches the
+        requested state, used to eject lanes faster than lane stepper can move. Lane stepper is enabled again
+        before returning.
+
+        :param sensor: Sensor to stop on, one of prep or load
+        :param triggered: Set to True to stop once sensor detects filament, False to stop once sensor is clear
+        :param timeout: Time in seconds to wait for sensor, defaults to espooler_eject_timeout
+        :return bool: True if sensor reached requested state, False if lane has no espooler or sensor timed out
+        """
+        if self.afc_motor_rwd is None:
+            return False
+        if timeout is None:
+            timeout = self.espooler_eject_timeout
+        self.wait_lane_moves()
+        if self.get_sensor_state(sensor) == triggered:
+            return True
+
+        completion = self.reactor.completion()
+        self._sensor_waits[sensor] = (triggered, completion)
+        try:
+            self.do_enable(False)
+            self.assist(-1)
+            # Sensor could have changed before wait was registered
+            if self.get_sensor_state(sensor) != triggered:
+                completion.wait(self.reactor.monotonic() + timeout, False)
+        finally:
+            self.assist(0)
+            self.do_enable(True)
+            del self._sensor_waits[sensor]
+        return self.get_sensor_state(sensor) == triggered
+
+    def stage_to_hub(self):
+        """
+        Moves lane from its load sensor to approach_margin before the hub sensor so the next tool load starts at
+        the hub. Moves run on the lanes own timeline and the toolhead is never waited on or flushed, so lanes can
+        be staged while printing. The hub sensor is not used since another lanes filament can be in the hub,
+        distance comes from the learned hub path or dist_hub.
 
+        :return bool: True if lane was staged, False if filament ran out during the move
+        """
+        mcu = self.extruder_stepper.stepper.get_mcu()
+        self.wait_lane_moves()
+        print_time = max(self.next_cmd_time, mcu.estimated_print_time(self.reactor.monotonic()) + LANE_MOVE_START_DELAY)
+        self.driver.set_enable(True, print_time)
+        moves = self.get_approach_moves([(self.get_path_length('hub', self.dist_hub), self.dist_hub_move_speed, self.dist_hub_move_accel)], 'hub')
+        if moves:
+            self.schedule_moves(moves, self.dist_hub > 200, print_time).wait()
+        print_time = max(self.next_cmd_time, mcu.estimated_print_time(self.reactor.monotonic()) + LANE_MOVE_START_DELAY)
+        self.driver.set_enable(False, print_time)
+        self.staged = self.get_abort_sensor(self.runout_abort) is None
+        return self.staged
+
+    def get_abort_sensor(self, abort_on):
+        """
+        Returns name of first sensor in `abort_on` that is currently in its abort state, None if there is none
+        """
+        for sensor, state in (abort_on or {}).items():
+            if self.get_sensor_state(sensor) == state:
+                return sensor
+        return None
+
+    def _endstop_move(self, endstop, sensor, moves, triggered, assist_active, abort_on=None):
+        """
+        Runs `moves` as one lane homing move that the MCU stops once `endstop` reaches `triggered`. Sensors in
+        `abort_on` stop step generation on the host instead, the MCU only allows a stepper on one trsync so they
+        cannot be added as endstops of the same move.
+
+        :param endstop: AFCLaneEndstop to stop on, None to only stop on `abort_on` sensors
+        :param sensor: Name of sensor `endstop` belongs to
+        :return float: Distance in mm lane moved
+        """
+        total_distance = sum(move[0] for move in moves)
+        max_speed = max(move[1] for move in moves)
+
+        # Endstops on hub and toolhead pins stop every lane added to them once triggered, lanes sharing them
+        # finish their background moves first
+        steppers = endstop.get_steppers() if endstop is not None else []
+        for lane in self.AFC.lanes.values():
+            if lane is not self and lane.extruder_stepper.stepper in steppers:
+                lane.wait_lane_moves()
+
+        self._homing_moves = moves
+        self._homing_assist = assist_active
+        self._homing_abort = abort_on
+        self.jam_detected = False
+        toolhead = self.toolhead
+        self._start_lane_motion()
+        self.next_cmd_time = max(toolhead.get_last_move_time(), self._flush_time)
+        boosted = self._start_boost(total_distance, self.next_cmd_time)
+        start_pos = self.get_position()[0]
+        try:
+            if endstop is None:
+                # Nothing for the MCU to stop on, completion is never set and only paces step generation
+                self.drip_move(None, max_speed, self.reactor.completion())
+                mcu = self.extruder_stepper.stepper.get_mcu()
+                while True:
+                    eventtime = self.reactor.monotonic()
+                    remaining = self.next_cmd_time - mcu.estimated_print_time(eventtime)
+                    if remaining <= 0.:
+                        break
+                    self.reactor.pause(eventtime + remaining)
+                # Commanded position is where the last generated step left the lane
+                moved = self.get_position()[0] - start_pos
+            else:
+                hmove = homing.HomingMove(self.printer, [(endstop, sensor)], self)
+                kin_spos = {s.get_name(): s.get_commanded_position() for s in self.get_steppers()}
+                hmove.homing_move([total_distance, 0., 0., 0.], max_speed, probe_pos=True,
+                                  triggered=triggered, check_triggered=False)
+        finally:
+            # Lane has stopped once homing move returns, next_cmd_time is still the planned end of the moves
+            stop_time = toolhead.get_last_move_time()
+            # Moves queued past the trigger point never ran, keep them out of the trapq history
+            self._end_lane_motion(self.next_cmd_time, clear_history=True)
+            if boosted: self._end_boost(stop_time)
+            # Let toolhead pick up from where it currently is
+            self.next_cmd_time = stop_time
+            if assist_active: self.assist(0)
+        if endstop is None:
+            return moved
+        # Trigger position is the halt position when the endstop did not trigger. Shared endstops also list
+        #  steppers of other lanes, those are skipped.
+        sp = next(sp for sp in hmove.stepper_positions if sp.stepper is self.extruder_stepper.stepper)
+        return hmove.calc_toolhead_pos(kin_spos, {sp.stepper_name: sp.trig_pos - sp.start_pos})[0]
+
+    def _poll_to_trigger(self, sensor, moves, triggered, assist_active, abort_on=None, path=None):
+        """
+        Fallback for `move_to_trigger` when sensor has no endstop, approach moves are done as one chained move
+        then lane is moved in short_move_dis steps and sensor state is checked after each move. The distance
+        returned is where the sensor edge happened, looked up from the edges print time in trapq history.
+        """
+        moved = 0.
+        toolhead = self.toolhead
+        start_time = max(self.next_cmd_time, toolhead.get_last_move_time())
+        if len(moves) > 1:
+            self.schedule_moves(moves[:-1], assist_active, start_time).wait()
+            moved = sum(move[0] for move in moves[:-1])
+            if self.get_abort_sensor(abort_on) is not None:
+                return False, moved
+            if self.get_sensor_state(sensor) == triggered:
+                return True, self._get_edge_travel(sensor, triggered, start_time, moved, path)
+        distance, speed, accel = moves[-1]
         direction = 1 if distance > 0 else -1
-        move_total = abs(distance)
+        sensor_moved = 0.
+        while abs(sensor_moved) < abs(distance):
+            move_dis = min(self.short_move_dis, abs(distance) - abs(sensor_moved)) * direction
+            self.move(move_dis, speed, accel, assist_active)
+            sensor_moved += move_dis
+            if self.get_abort_sensor(abort_on) is not None:
+                return False, moved + sensor_moved
+            if self.get_sensor_state(sensor) == triggered:
+                return True, self._get_edge_travel(sensor, triggered, start_time, moved + sensor_moved, path)
+        return False, moved + sensor_moved
+
+    def _get_edge_travel(self, sensor, triggered, start_time, default, path=None):
+        """
+        Returns distance lane moved from `start_time` until `sensor` last changed to `triggered`, falls back to
+        `default` when the edge was not seen after `start_time`. Distances from sensor edges are accurate enough
+        to be recorded for `path`.
+        """
+        edge = self.sensor_edges.get(sensor)
+        if edge is None or edge[1] != triggered or edge[0] < start_time:
+            return default
+        travel = self.get_lane_travel(start_time, edge[0])
+        if path is not None:
+            self.learn_path_length(path, travel)
+        return travel
+
+    def note_sensor_edge(self, sensor, eventtime, state):
+        """
+        Records print time of a sensor edge so the lane position at the edge can be looked up later, called from
+        button callbacks of lane, hub and toolhead sensors
+
+        :param sensor: Sensor name, one of prep, load, hub, tool_start or tool_end
+        :param eventtime: Reactor time passed to the button callback
+        :param state: New sensor state
+        """
+        mcu = self.extruder_stepper.stepper.get_mcu()
+        self.sensor_edges[sensor] = (mcu.estimated_print_time(eventtime), state)
+        wait = self._sensor_waits.get(sensor)
+        if wait is not None and wait[0] == state:
+            wait[1].complete(True)
+
+    def get_lane_travel(self, start_time, end_time):
+        """
+        Returns distance in mm lane moved between two print times, calculated from moves in the lanes trapq
+        history. Lane positions are reset whenever lane motion starts so distance is summed per move.
+
+        :param start_time: Print time to measure from
+        :param end_time: Print time to measure to
+        :return float: Distance lane moved, negative values are retracts
+        """
+        data = self._ffi_main.new('struct pull_move[{}]'.format(MAX_HISTORY_MOVES))
+        count = self.trapq_extract_old(self.trapq, data, MAX_HISTORY_MOVES, start_time, end_time)
+        travel = 0.
+        for i in range(count):
+            move = data[i]
+            move_start = max(start_time, move.print_time) - move.print_time
+            move_end = min(end_time, move.print_time + move.move_t) - move.print_time
+            if move_end <= move_start:
+                continue
+            travel += move.x_r * ((move.start_v + .5 * move.accel * move_end) * move_end
+                                  - (move.start_v + .5 * move.accel * move_start) * move_start)
+        return travel
+
+    # Homing interface, lane acts as its own toolhead and kinematics when doing sensor terminated moves
+    def get_position(self):
+        return [self.extruder_stepper.stepper.get_commanded_position(), 0., 0., 0.]
+
+    def set_position(self, newpos, homing_axes=()):
+        self.extruder_stepper.stepper.set_position((newpos[0], 0., 0.))
 
-        # Breaks up move length to help with TTC errors
-        while move_total > 0:
-            move_value = self.max_move_dis if move_total > self.max_move_dis else move_total
-            move_total -= move_value
-            # Adding back direction
-            move_value = move_value * direction
+    def get_last_move_time(self):
+        return self.next_cmd_time
 
-            self._move(move_value, speed, accel, assist_active)
+    def dwell(self, delay):
+        self.next_cmd_time += max(0., delay)
+
+    def drip_move(self, newpos, speed, drip_completion):
+        start_pos = self.get_position()[0]
+        self.next_cmd_time = self._queue_lane_moves(self.next_cmd_time, start_pos, self._homing_moves,
+                                                    drip_completion, self._homing_assist, self._homing_abort)
+
+    def flush_step_generation(self):
+        pass
+
+    def get_kinematics(self):
+        return self
+
+    def get_steppers(self):
+        return [self.extruder_stepper.stepper]
+
+    def calc_position(self, stepper_positions):
+        return [stepper_positions[self.extruder_stepper.stepper.get_name()], 0., 0.]
 
     def set_afc_prep_done(self):
         """
@@ -402,9 +1669,13 @@ class AFCExtruderStepper:
         """
         self._afc_prep_done = True
     def load_callback(self, eventtime, state):
+        self.note_sensor_edge('load', eventtime, state)
         self.load_state = state
+        # Filament pulled back past the load sensor is no longer staged at the hub
+        if not state: self.staged = False
 
     def prep_callback(self, eventtime, state):
+        self.note_sensor_edge('prep', eventtime, state)
         self.prep_state = state
         # Checking to make sure printer is ready and making sure PREP has been called before trying to load anything
         if self.printer.state_message == 'Printer is ready' and True == self._afc_prep_done and self.status != 'Tool Unloading':
@@ -470,23 +1741,16 @@ class AFCExtruderStepper:
             else:
                 self.status = None
                 self.loaded_to_hub = False
+                self.staged = False
                 self.AFC.SPOOL._clear_values(self)
                 self.AFC.FUNCTION.afc_led(self.AFC.led_not_ready, self.led_index)
             self.AFC.save_vars()
 
     def do_enable(self, enable):
-        self.sync_print_time()
-        stepper_enable = self.printer.lookup_object('stepper_enable')
-        if enable:
-            se = stepper_enable.lookup_enable('AFC_stepper ' + self.name)
-            se.motor_enable(self.next_cmd_time)
-        else:
-            se = stepper_enable.lookup_enable('AFC_stepper ' + self.name)
-            se.motor_disable(self.next_cmd_time)
-        self.sync_print_time()
+        self.driver.set_enable(enable)
 
     def sync_print_time(self):
-        toolhead = self.printer.lookup_object('toolhead')
+        toolhead = self.toolhead
         print_time = toolhead.get_last_move_time()
         if self.next_cmd_time > print_time:
             toolhead.dwell(self.next_cmd_time - print_time)
@@ -499,7 +1763,8 @@ class AFCExtruderStepper:
 
         :param update_current: Sets current to specified print current when True
         """
-        self.extruder_stepper.sync_to_extruder(self.extruder_name)
+        self.wait_lane_moves()
+        self.driver.set_sync(self.extruder_name)
         if update_current: self.set_print_current()
 
     def unsync_to_extruder(self, update_current=True):
@@ -508,7 +1773,8 @@ class AFCExtruderStepper:
 
         :param update_current: Sets current to specified load current when True
         """
-        self.extruder_stepper.sync_to_extruder(None)
+        self.wait_lane_moves()
+        self.driver.set_sync(None)
         if update_current: self.set_load_current()
 
     def _set_current(self, current):
@@ -518,7 +1784,24 @@ class AFCExtruderStepper:
         :param current: Sets TMC current to specified value
         """
         if self.tmc_print_current is not None:
-            self.gcode.run_script_from_command("SET_TMC_CURRENT STEPPER='{}' CURRENT={}".format(self.name, current))
+            self.driver.set_current(current)
+
+    def _start_boost(self, distance, print_time):
+        """
+        Raises lane current to boost_current at `print_time` for moves of at least BOOST_MIN_DISTANCE
+
+        :return bool: True if current was raised and `_end_boost` needs to be called once move ends
+        """
+        if self.boost_current is None or abs(distance) < BOOST_MIN_DISTANCE:
+            return False
+        self.driver.set_current(self.boost_current, print_time)
+        return True
+
+    def _end_boost(self, print_time):
+        """
+        Drops lane current back to run current at `print_time`
+        """
+        self.driver.set_current(self.tmc_load_current, print_time)
 
     def set_load_current(self):
         """
@@ -532,8 +1815,51 @@ class AFCExtruderStepper:
         """
         self._set_current( self.tmc_print_current )
 
+    def check_lane_motion(self, action):
+        """
+        Raises an error when lane motion has the stepper swapped onto the lanes trapq, syncing or changing rotation
+        distance then would change steps that lane motion is still generating
+
+        :param action: Name of what was attempted, used in error message
+        """
+        if self._lane_motion_active:
+            raise self.gcode.error("Cannot {} lane {} while it is moving on its own".format(action, self.name))
+
     def update_rotation_distance(self, multiplier):
-        self.extruder_stepper.stepper.set_rotation_distance( self.base_rotation_dist / multiplier )
+        """
+        Changes rotation distance right away, toolhead step generation is flushed first when lane is synced so
+        steps of queued extruder moves are not rescaled
+        """
+        self.check_lane_motion("change rotation distance of")
+        if self.extruder_stepper.stepper.get_trapq() is not None:
+            self.toolhead.flush_step_generation()
+        self._set_rotation_distance(multiplier)
+
+    def _set_rotation_distance(self, multiplier):
+        self._pending_multiplier = None
+        self._multiplier_time = None
+        stepper = self.extruder_stepper.stepper
+        rotation_dist = self.base_rotation_dist / multiplier
+        if stepper.get_rotation_distance()[0] != rotation_dist:
+            stepper.set_rotation_distance( rotation_dist )
+
+    def schedule_rotation_distance(self, multiplier):
+        """
+        Queues a rotation distance multiplier change with the toolheads lookahead so it takes effect at the end of
+        the moves already queued. The lookahead callback only records that print time, change is applied by
+        `_toolhead_generate_steps` once toolhead step generation reaches it. Changes made before the queued change
+        is applied replace it so quick buffer toggles only change rotation distance once.
+
+        :param multiplier: Multiplier to apply to base rotation distance
+        """
+        pending = self._pending_multiplier is not None
+        self._pending_multiplier = multiplier
+        if not pending:
+            self.toolhead.register_lookahead_callback(self._note_multiplier_time)
+
+    def _note_multiplier_time(self, print_time):
+        if self._pending_multiplier is not None:
+            self._multiplier_time = print_time
 
     def calculate_effective_diameter(self, weight_g, spool_width_mm=60):
 
@@ -548,6 +1874,34 @@ class AFCExtruderStepper:
 
         return spool_outer_diameter_mm
 
+    def _get_spool_effective_mass(self, weight_g):
+        """
+        Returns mass in g that filament has to accelerate when pulling on a spool holding `weight_g` of filament,
+        spool inertia divided by the radius filament leaves the spool at squared. Empty spool and filament are
+        modeled as rings between their inner and outer radius.
+        """
+        inner_radius = self.inner_diameter / 2.
+        spool_radius = self.outer_diameter / 2.
+        filament_radius = max(self.calculate_effective_diameter(weight_g) / 2., inner_radius)
+        inertia = (self.empty_spool_weight * (inner_radius ** 2 + spool_radius ** 2)
+                   + weight_g * (inner_radius ** 2 + filament_radius ** 2)) / 2.
+        return inertia / filament_radius ** 2
+
+    def get_spool_accel_scale(self):
+        """
+        Returns factor to scale lane move acceleration by for the current spool. Configured accelerations are used
+        for a full SPOOL_REFERENCE_WEIGHT spool, lighter or emptier spools have less inertia and are moved at up to
+        max_accel_multiplier times configured acceleration.
+
+        :return float: Acceleration scale, 1 when spool_inertia_accel is disabled
+        """
+        if not self.spool_inertia_accel:
+            return 1.
+        weight = max(self.remaining_weight - self.empty_spool_weight, 0.)
+        scale = (self._get_spool_effective_mass(SPOOL_REFERENCE_WEIGHT)
+                 / self._get_spool_effective_mass(weight))
+        return min(scale, self.max_accel_multiplier)
+
     def calculate_rpm(self, feed_rate):
         """
         Calculate the RPM for the assist motor based on the filament feed rate.
@@ -683,6 +2037,13 @@ class AFCExtruderStepper:
         response['filament_status'] = filiment_stat[0]
         response['filament_status_led'] = filiment_stat[1]
         response['status'] = self.status
+        response['path_lengths'] = {path: path_length.get_status() for path, path_length in self.path_lengths.items()}
+        response['rotation_distance'] = self.base_rotation_dist
+        response['config_rotation_distance'] = self.config_rotation_dist
+        response['staged'] = self.staged
+        response['driver_skips'] = dict(self.driver.skips)
+        response['accel_scale'] = round(self.get_spool_accel_scale(), 2)
+        response['jam_detection'] = self.driver_load.get_status() if self.jam_detection else None
         return response
 
 def load_config_prefix(config):
@@ -30,4 +30,27 @@ def add_filament_switch( switch_name, switch_pin, printer ):
     fila.runout_helper.sensor_enabled = False
     fila.runout_helper.runout_pause = False
 
-    return fila
\ No newline at end of file
+    return fila
+
+def add_endstop( endstop_pin, stepper, printer ):
+    """
+    Helper function to add a stepper to the MCU endstop on a sensor pin so that moves of the stepper can be stopped
+    by the MCU once the sensor changes state. One endstop is created per pin and shared by every stepper added to
+    it, hub and toolhead sensors are used by all lanes that feed them. Pin is allowed to be shared since sensor
+    pins are also registered as buttons.
+
+    :param endstop_pin: Pin to create endstop on
+    :param stepper: Stepper object that endstop should stop when triggered
+    :param printer: printer object
+
+    :return returns mcu_endstop object
+    """
+    endstops = printer.lookup_object('AFC').endstops
+    mcu_endstop = endstops.get(endstop_pin.strip())
+    if mcu_endstop is None:
+        ppins = printer.lookup_object('pins')
+        ppins.allow_multi_use_pin(endstop_pin.strip("!^~ "))
+        mcu_endstop = endstops[endstop_pin.strip()] = ppins.setup_pin('endstop', endstop_pin)
+    mcu_endstop.add_stepper(stepper)
+
+    return mcu_endstop